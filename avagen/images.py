@@ -0,0 +1,192 @@
+"""
+Responsive image derivatives for uploaded product and profile images.
+
+When a form saves a new upload, the original is resized with Pillow to
+several widths in WebP and JPEG, plus a tiny blurred placeholder, in a
+background thread once the transaction commits. The result is stored
+on the model's derivatives JSONField and rendered by the
+``responsive_image`` template tag (products.templatetags).
+"""
+
+import base64
+import logging
+import os
+import threading
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+DERIVATIVE_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+DERIVATIVE_QUALITY = 80
+PLACEHOLDER_WIDTH = 16
+
+# (model label, image field, derivatives field) for every image that
+# gets derivatives; used by the build_image_derivatives command
+DERIVATIVE_SOURCES = [
+    ("products.DigitalProduct", "image", "image_derivatives"),
+    ("profiles.UserProfile", "profile_image", "image_derivatives"),
+]
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(
+        buffer, image_format, quality=DERIVATIVE_QUALITY, optimize=True
+    )
+    return buffer.getvalue()
+
+
+def _resize(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def build_derivatives(field_file):
+    """
+    Resize an uploaded image and save the results next to it.
+
+    Returns the description stored on the model: the source name, its
+    size, the saved file names per format and width, and a data URI
+    placeholder.
+    """
+    with field_file.open("rb") as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    # Never upscale: keep the widths below the original, or the
+    # original width alone if it is smaller than all of them
+    widths = [width for width in DERIVATIVE_WIDTHS if width < image.width]
+    if not widths:
+        widths = [image.width]
+
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+    files = {}
+    for extension, image_format in DERIVATIVE_FORMATS.items():
+        files[extension] = {}
+        for width in widths:
+            name = default_storage.save(
+                os.path.join(
+                    directory, "derivatives", f"{stem}-{width}.{extension}"
+                ),
+                ContentFile(_encode(_resize(image, width), image_format)),
+            )
+            files[extension][str(width)] = name
+
+    thumbnail = _resize(image, min(PLACEHOLDER_WIDTH, image.width))
+    thumbnail = thumbnail.filter(ImageFilter.GaussianBlur(1))
+    placeholder = base64.b64encode(_encode(thumbnail, "JPEG")).decode()
+
+    return {
+        "source": field_file.name,
+        "width": image.width,
+        "height": image.height,
+        "files": files,
+        "placeholder": f"data:image/jpeg;base64,{placeholder}",
+    }
+
+
+def delete_derivatives(derivatives):
+    """Remove the files of an outdated set of derivatives."""
+    for names in (derivatives or {}).get("files", {}).values():
+        for name in names.values():
+            try:
+                default_storage.delete(name)
+            except Exception:
+                logger.warning("Could not delete derivative %s", name)
+
+
+def generate_derivatives(model_label, pk, image_field, derivatives_field):
+    """
+    Build derivatives for one saved instance and store them on it.
+    Does nothing if the image was removed or already has derivatives.
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, image_field)
+    previous = getattr(instance, derivatives_field) or {}
+    if not field_file or previous.get("source") == field_file.name:
+        return
+
+    try:
+        derivatives = build_derivatives(field_file)
+    except Exception:
+        logger.exception(
+            "Could not build image derivatives for %s %s", model_label, pk
+        )
+        return
+    setattr(instance, derivatives_field, derivatives)
+    instance.save(update_fields=[derivatives_field])
+    delete_derivatives(previous)
+
+
+def _run(*args):
+    try:
+        generate_derivatives(*args)
+    finally:
+        # Threads get their own connections, which Django won't close
+        connection.close()
+
+
+def schedule_derivatives(instance, image_field, derivatives_field):
+    """
+    Build derivatives for ``instance`` after the current transaction
+    commits, in a background thread unless IMAGE_DERIVATIVES_ASYNC is
+    off.
+    """
+    args = (
+        instance._meta.label,
+        instance.pk,
+        image_field,
+        derivatives_field,
+    )
+
+    def start():
+        if getattr(settings, "IMAGE_DERIVATIVES_ASYNC", True):
+            threading.Thread(target=_run, args=args, daemon=True).start()
+        else:
+            generate_derivatives(*args)
+
+    transaction.on_commit(start)
+
+
+class ImageDerivativesFormMixin:
+    """
+    ModelForm mixin that schedules derivatives for any image field in
+    ``derivative_fields`` (``{image field: derivatives field}``) that
+    received a new upload. Views that save with ``commit=False`` call
+    ``schedule_image_derivatives`` themselves once the instance is
+    saved.
+    """
+
+    derivative_fields = {}
+
+    def save(self, commit=True):
+        instance = super().save(commit=commit)
+        if commit:
+            self.schedule_image_derivatives()
+        return instance
+
+    def schedule_image_derivatives(self):
+        for image_field, derivatives_field in self.derivative_fields.items():
+            if image_field in self.changed_data and getattr(
+                self.instance, image_field
+            ):
+                schedule_derivatives(
+                    self.instance, image_field, derivatives_field
+                )
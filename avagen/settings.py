@@ -267,6 +267,34 @@ DATABASES = {
     )
 }
 
+# --------------------------------------------------------------------
+# CACHE
+# --------------------------------------------------------------------
+
+# Catalog caches are invalidated by bumping a version key, so when more
+# than one process serves requests they must share a memory cache. Set
+# CACHE_LOCATION to a Memcached server (host:port) in production; each
+# process falls back to its own local memory cache in development.
+# CACHE_BACKEND selects another backend for that location.
+
+if os.getenv("CACHE_LOCATION"):
+    CACHES = {
+        "default": {
+            "BACKEND": os.getenv(
+                "CACHE_BACKEND",
+                "django.core.cache.backends.memcached.PyMemcacheCache",
+            ),
+            "LOCATION": os.getenv("CACHE_LOCATION"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "avagen",
+        }
+    }
+
 # --------------------------------------------------------------------
 # PASSWORD VALIDATORS
 # --------------------------------------------------------------------
@@ -327,6 +355,20 @@ else:
             "django.core.files.storage.FileSystemStorage"
         )
 
+# --------------------------------------------------------------------
+# LICENSING
+# --------------------------------------------------------------------
+
+# Price multiplier applied to a product's base price for each license,
+# cheapest first. The first tier is the "from" price on listings.
+# Products store their prices, so run `manage.py rebuild_license_prices`
+# after changing a multiplier.
+LICENSE_TIERS = {
+    "personal": "1.00",
+    "indie": "1.15",
+    "professional": "1.35",
+}
+
 # --------------------------------------------------------------------
 # STRIPE
 # --------------------------------------------------------------------
@@ -342,5 +384,7 @@ STRIPE_SECRET_KEY = os.getenv(
 STRIPE_WH_SECRET = os.getenv(
     "STRIPE_WH_SECRET", ""
 )
+# Overrides the Stripe API host, e.g. a local stripe-mock for testing
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
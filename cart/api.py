@@ -0,0 +1,182 @@
+"""
+JSON endpoints for editing the cart without a page reload.
+
+Each endpoint changes the session cart and answers with the changed
+lines and the new totals, so the cart page can patch itself in place.
+``batch`` applies several changes in one request, either all of them or
+none.
+"""
+
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+
+from .inventory import MAX_QUANTITY, apply_cart_change, cart_contents
+from products.models import LICENSE_MULTIPLIERS
+from products.pricing import load_products
+
+# Changes ``batch`` accepts, and whether each adds to the line
+ACTIONS = {"add": True, "set": False, "remove": False}
+
+
+class CartChangeError(ValueError):
+    """A requested cart change is malformed or names a missing product."""
+
+
+def _parse_change(item_id, action, license_type, quantity):
+    """Validate one change, returning it with a whole-number quantity."""
+    if action not in ACTIONS:
+        raise CartChangeError(f"Unknown action {action!r}.")
+    try:
+        item_id = int(item_id)
+    except (TypeError, ValueError):
+        raise CartChangeError("Invalid product id.")
+    license_type = license_type or "personal"
+    if license_type not in LICENSE_MULTIPLIERS:
+        raise CartChangeError(f"Unknown license {license_type!r}.")
+    if action == "remove":
+        quantity = 0
+    else:
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise CartChangeError("Quantity must be a whole number.")
+        lowest = 1 if action == "add" else 0
+        if not lowest <= quantity <= MAX_QUANTITY:
+            raise CartChangeError(
+                f"Quantity must be between {lowest} and {MAX_QUANTITY}."
+            )
+    return {
+        "item_id": item_id,
+        "action": action,
+        "license_type": license_type,
+        "quantity": quantity,
+    }
+
+
+def _apply_changes(request, changes):
+    """
+    Apply validated changes to the session cart, after checking in one
+    query that every product added or kept still exists.
+    """
+    wanted = {
+        change["item_id"] for change in changes if change["quantity"] > 0
+    }
+    missing = wanted - set(load_products(wanted))
+    if missing:
+        raise CartChangeError(f"Product {min(missing)} not found.")
+
+    cart = request.session.get("cart", {})
+    cart_keys = []
+    for change in changes:
+        cart_key = apply_cart_change(
+            cart,
+            change["item_id"],
+            change["license_type"],
+            change["quantity"],
+            add=ACTIONS[change["action"]],
+        )
+        if cart_key not in cart_keys:
+            cart_keys.append(cart_key)
+    request.session["cart"] = cart
+    return cart_keys
+
+
+def _cart_response(request, cart_keys):
+    """Serialise the given cart lines and the cart totals."""
+    contents = cart_contents(request)
+    items = {item["cart_key"]: item for item in contents["cart_items"]}
+    lines = []
+    for cart_key in cart_keys:
+        item = items.get(cart_key)
+        if item is None:
+            lines.append({"cart_key": cart_key, "quantity": 0})
+            continue
+        lines.append(
+            {
+                "cart_key": cart_key,
+                "item_id": int(item["item_id"]),
+                "license_type": item["license_type"],
+                "quantity": item["quantity"],
+                "unit_price": f"{item['unit_price']:.2f}",
+                "item_total": f"{item['item_total']:.2f}",
+            }
+        )
+    return JsonResponse(
+        {
+            "lines": lines,
+            "item_count": contents["item_count"],
+            "subtotal": f"{contents['subtotal']:.2f}",
+            "grand_total": f"{contents['grand_total']:.2f}",
+        }
+    )
+
+
+def _single_change(request, item_id, action):
+    try:
+        change = _parse_change(
+            item_id,
+            action,
+            request.POST.get("license"),
+            request.POST.get("quantity"),
+        )
+        cart_keys = _apply_changes(request, [change])
+    except CartChangeError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return _cart_response(request, cart_keys)
+
+
+@require_POST
+def add(request, item_id):
+    """Add ``quantity`` of a product, under ``license``, to the cart."""
+    return _single_change(request, item_id, "add")
+
+
+@require_POST
+def adjust(request, item_id):
+    """Set the quantity of a cart line; zero removes it."""
+    return _single_change(request, item_id, "set")
+
+
+@require_POST
+def remove(request, item_id):
+    """Remove a cart line."""
+    return _single_change(request, item_id, "remove")
+
+
+@require_POST
+def batch(request):
+    """
+    Apply a JSON list of changes, each an object with ``item_id``,
+    ``action`` (add, set or remove), ``license`` and ``quantity``::
+
+        {"changes": [{"item_id": 3, "action": "set", "quantity": 2}]}
+    """
+    try:
+        data = json.loads(request.body)
+        changes = data["changes"]
+        if not isinstance(changes, list) or not all(
+            isinstance(change, dict) for change in changes
+        ):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"error": "Expected a JSON object with a list of changes."},
+            status=400,
+        )
+
+    try:
+        changes = [
+            _parse_change(
+                change.get("item_id"),
+                change.get("action", "set"),
+                change.get("license"),
+                change.get("quantity"),
+            )
+            for change in changes
+        ]
+        cart_keys = _apply_changes(request, changes)
+    except CartChangeError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return _cart_response(request, cart_keys)
@@ -1,41 +1,81 @@
-from products.models import DigitalProduct
+import json
+
+from products.pricing import load_products, price_licenses
+
+# Largest quantity of one product and license a cart line can hold
+MAX_QUANTITY = 99
+
+
+def make_cart_key(item_id, license_type):
+    """Return the session key of the cart line for a product and license."""
+    return f"{item_id}_{license_type}"
+
+
+def apply_cart_change(cart, item_id, license_type, quantity, add=False):
+    """
+    Set, or with ``add`` increase, the quantity of one cart line in
+    place. A resulting quantity of zero or less removes the line.
+    Returns the line's cart key.
+    """
+    cart_key = make_cart_key(item_id, license_type)
+    if add and cart_key in cart:
+        quantity += cart[cart_key].get("quantity", 0)
+    if quantity > 0:
+        cart[cart_key] = {
+            "item_id": str(item_id),
+            "quantity": min(quantity, MAX_QUANTITY),
+            "license_type": license_type,
+        }
+    else:
+        cart.pop(cart_key, None)
+    return cart_key
 
 
 def get_cart_items(cart):
     """
     Process cart items and return list of items with their details.
+    All products are loaded and priced in one query.
     """
     cart_items = []
     subtotal = 0
     item_count = 0
 
-    for cart_key, item_data in cart.items():
-        if isinstance(item_data, dict) and 'item_id' in item_data:
-            try:
-                item_id = item_data["item_id"]
-                product = DigitalProduct.objects.get(pk=item_id)
-                quantity = item_data["quantity"]
-                license_type = item_data["license_type"]
-                item_total = quantity * product.get_price_for_license(
-                    license_type
-                )
-
-                cart_items.append(
-                    {
-                        "item_id": item_id,
-                        "cart_key": cart_key,
-                        "quantity": quantity,
-                        "product": product,
-                        "license_type": license_type,
-                        "item_total": item_total,
-                    }
-                )
-
-                subtotal += item_total
-                item_count += quantity
-            except DigitalProduct.DoesNotExist:
-                # Skip items that no longer exist in the database
-                continue
+    lines = [
+        (cart_key, item_data)
+        for cart_key, item_data in cart.items()
+        if isinstance(item_data, dict) and 'item_id' in item_data
+    ]
+    products = load_products(item_data["item_id"] for _, item_data in lines)
+    unit_prices = price_licenses(
+        [
+            (item_data["item_id"], item_data["license_type"])
+            for _, item_data in lines
+        ],
+        products,
+    )
+
+    for (cart_key, item_data), unit_price in zip(lines, unit_prices):
+        if unit_price is None:
+            # Skip items that no longer exist in the database
+            continue
+        item_id = item_data["item_id"]
+        quantity = item_data["quantity"]
+        item_total = quantity * unit_price
+
+        cart_items.append(
+            {
+                "item_id": item_id,
+                "cart_key": cart_key,
+                "quantity": quantity,
+                "product": products[int(item_id)],
+                "license_type": item_data["license_type"],
+                "unit_price": unit_price,
+                "item_total": item_total,
+            }
+        )
+
+        subtotal += item_total
+        item_count += quantity
     return cart_items, subtotal, item_count
 
 
@@ -43,21 +83,31 @@ def cart_contents(request):
     """
     Make cart contents available across the site.
     Returns a dictionary containing cart information for template context.
+
+    The result is memoized on the request, so the context processor and
+    the cart and checkout views share one computation. It is worked out
+    again if the session cart changes in between.
     """
     cart = request.session.get("cart", {})
+    snapshot = json.dumps(cart, sort_keys=True, default=str)
+    memo = getattr(request, "_cart_contents", None)
+    if memo is not None and memo[0] == snapshot:
+        return memo[1]
 
     if not cart:
-        return {
+        contents = {
             "cart_items": [],
             "subtotal": 0,
             "item_count": 0,
             "grand_total": 0,
         }
-    cart_items, subtotal, item_count = get_cart_items(cart)
-
-    return {
-        "cart_items": cart_items,
-        "subtotal": subtotal,
-        "item_count": item_count,
-        "grand_total": subtotal,
-    }
+    else:
+        cart_items, subtotal, item_count = get_cart_items(cart)
+        contents = {
+            "cart_items": cart_items,
+            "subtotal": subtotal,
+            "item_count": item_count,
+            "grand_total": subtotal,
+        }
+    request._cart_contents = (snapshot, contents)
+    return contents
@@ -12,6 +12,8 @@ def calc_subtotal(price, quantity):
 @register.filter(name='get_unit_price')
 def get_unit_price(cart_item):
     """Get the unit price for a cart item based on its license type"""
+    if 'unit_price' in cart_item:
+        return cart_item['unit_price']
     product = cart_item['product']
     license_type = cart_item['license_type']
     return product.get_price_for_license(license_type)
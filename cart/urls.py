@@ -1,9 +1,13 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.view_cart, name='view_cart'),
     path('add/<item_id>/', views.add_to_cart, name='add_to_cart'),
     path('adjust/<item_id>/', views.adjust_cart, name='adjust_cart'),
     path('remove/<item_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('api/add/<int:item_id>/', api.add, name='cart_api_add'),
+    path('api/adjust/<int:item_id>/', api.adjust, name='cart_api_adjust'),
+    path('api/remove/<int:item_id>/', api.remove, name='cart_api_remove'),
+    path('api/batch/', api.batch, name='cart_api_batch'),
 ]
@@ -1,3 +1,49 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from products.listing import PRODUCTS_PER_PAGE
+from products.models import DigitalProduct
+
+
+class CatalogueTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for index in range(PRODUCTS_PER_PAGE + 5):
+            DigitalProduct.objects.create(
+                name=f"Avatar {index}", base_price=Decimal("5.00")
+            )
+        # Every product shares one timestamp, so only the id breaks ties
+        DigitalProduct.objects.update(created_at=timezone.now())
+        self.url = reverse("catalogue:catalogue")
+
+    def test_pages_list_newest_first_without_repeats(self):
+        first = self.client.get(self.url)
+        second = self.client.get(
+            f"{self.url}?{first.context['next_page_query']}"
+        )
+
+        ids = [product.pk for product in first.context["products"]]
+        ids += [product.pk for product in second.context["products"]]
+        self.assertEqual(
+            ids,
+            list(
+                DigitalProduct.objects.order_by("-id").values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+        self.assertIsNone(second.context["next_page_query"])
+        self.assertEqual(first.context["product_count"], PRODUCTS_PER_PAGE + 5)
 
-# Create your tests here.
+    def test_bad_cursor_shows_the_first_page(self):
+        response = self.client.get(self.url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.context["products"]), PRODUCTS_PER_PAGE
+        )
+        self.assertIsNone(response.context["previous_page_query"])
@@ -2,6 +2,12 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.http import Http404, FileResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from products.listing import (
+    filter_products,
+    get_listing_page,
+    load_page,
+    page_query,
+)
 from products.models import DigitalProduct
 from checkout.models import Order
 from .models import DigitalDownload
@@ -9,13 +15,18 @@ from .models import DigitalDownload
 
 def catalogue(request):
     """
-    View to display the catalogue of available products
+    View to display the catalogue of available products, newest first,
+    one cached page at a time
     """
-    products = DigitalProduct.objects.filter(status="published").order_by(
-        "-date_created"
-    )
+    listing = filter_products({"sort": "newest"})
+    page_data = get_listing_page(listing, request.GET.get("cursor"))
+    page = load_page(page_data, "category")
     context = {
-        "products": products,
+        "products": page.object_list,
+        "page": page,
+        "product_count": page_data["count"],
+        "next_page_query": page_query(request, page.next_cursor),
+        "previous_page_query": page_query(request, page.previous_cursor),
     }
     return render(request, "catalogue/catalogue.html", context)
 
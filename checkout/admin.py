@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib import messages
 from django.utils import timezone
 from django.utils.html import format_html
-from .models import Order, OrderLineItem
+from .models import Order, OrderLineItem, WebhookEvent
 
 
 class OrderLineItemAdminInline(admin.TabularInline):
@@ -128,6 +128,44 @@ class OrderAdmin(admin.ModelAdmin):
         return super().has_delete_permission(request, obj)
 
 
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    """Admin view of the Stripe webhook inbox"""
+
+    list_display = (
+        "event_id",
+        "event_type",
+        "status",
+        "attempts",
+        "received_at",
+        "processed_at",
+    )
+    list_filter = ("status", "event_type")
+    search_fields = ("event_id",)
+    ordering = ("-received_at",)
+    readonly_fields = (
+        "event_id",
+        "event_type",
+        "payload",
+        "attempts",
+        "last_error",
+        "received_at",
+        "processed_at",
+    )
+    actions = ["retry_events"]
+
+    def retry_events(self, request, queryset):
+        """Queue the selected events to be processed again"""
+        updated = queryset.exclude(status="processing").update(
+            status="pending", next_attempt_at=timezone.now()
+        )
+        self.message_user(
+            request, f"{updated} event(s) queued for retry.", messages.SUCCESS
+        )
+
+    retry_events.short_description = "Retry selected events"
+
+
 # Customize admin site headers
 
 
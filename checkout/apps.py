@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CheckoutConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'checkout'
+
+    def ready(self):
+        # Import signals to register them
+        # pylint: disable=unused-import
+        import checkout.signals  # noqa
@@ -0,0 +1,133 @@
+"""
+A durable inbox for Stripe webhook events.
+
+The webhook view only verifies an event and records it here, keyed by
+Stripe's event id, so it can answer at once and redeliveries of the same
+event are dropped. The ``process_webhooks`` command then hands each
+event to ``StripeWH_Handler``, retrying failures with backoff.
+"""
+
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import WebhookEvent
+from .webhook_handler import StripeWH_Handler
+
+# Give the checkout view time to save its order before the webhook
+# looks for it, rather than making the handler wait and poll
+SETTLE_SECONDS = 5
+MAX_ATTEMPTS = 8
+# Longest retry delay, and how long a worker may hold an event before
+# another worker assumes it died and takes the event over
+MAX_RETRY_DELAY = timedelta(hours=1)
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+DUE_STATUSES = ("pending", "processing")
+
+
+class WebhookFailed(Exception):
+    """The handler answered an event with an error response."""
+
+
+def record_event(payload):
+    """
+    Store a verified event, given as its decoded JSON payload, for
+    processing. Returns False if the event was already recorded.
+    """
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(
+                event_id=payload["id"],
+                event_type=payload["type"],
+                payload=payload,
+                next_attempt_at=(
+                    timezone.now() + timedelta(seconds=SETTLE_SECONDS)
+                ),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def dispatch(event):
+    """Pass an event to the handler method for its type."""
+    handler = StripeWH_Handler()
+
+    # Map webhook events to relevant handler functions
+    event_map = {
+        "payment_intent.succeeded":
+            handler.handle_payment_intent_succeeded,
+        "payment_intent.payment_failed":
+            handler.handle_payment_intent_payment_failed,
+    }
+    event_handler = event_map.get(event["type"], handler.handle_event)
+    return event_handler(event)
+
+
+def claim_due_events(limit):
+    """
+    Claim up to ``limit`` events that are due, oldest first. Each claim
+    is a conditional UPDATE, so concurrent workers never share an event.
+    """
+    now = timezone.now()
+    due = WebhookEvent.objects.filter(
+        status__in=DUE_STATUSES, next_attempt_at__lte=now
+    )
+    claimed = []
+    for pk in due.order_by("next_attempt_at", "pk").values_list(
+        "pk", flat=True
+    )[:limit]:
+        if due.filter(pk=pk).update(
+            status="processing",
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + CLAIM_TIMEOUT,
+        ):
+            claimed.append(pk)
+    return list(WebhookEvent.objects.filter(pk__in=claimed).order_by("pk"))
+
+
+def process_event(webhook_event, max_attempts=MAX_ATTEMPTS):
+    """
+    Run the handler for a claimed event, then mark it done, or schedule
+    a retry with exponential backoff until ``max_attempts`` is reached.
+    Returns True if the event was handled.
+    """
+    event = stripe.Event.construct_from(
+        webhook_event.payload, settings.STRIPE_SECRET_KEY
+    )
+    try:
+        response = dispatch(event)
+        if response.status_code >= 400:
+            raise WebhookFailed(response.content.decode(errors="replace"))
+    except Exception as e:
+        webhook_event.last_error = f"{type(e).__name__}: {e}"
+        if webhook_event.attempts >= max_attempts:
+            webhook_event.status = "failed"
+        else:
+            webhook_event.status = "pending"
+            delay = timedelta(
+                seconds=SETTLE_SECONDS * 2 ** webhook_event.attempts
+            )
+            webhook_event.next_attempt_at = timezone.now() + min(
+                delay, MAX_RETRY_DELAY
+            )
+        handled = False
+    else:
+        webhook_event.status = "done"
+        webhook_event.last_error = ""
+        webhook_event.processed_at = timezone.now()
+        handled = True
+    webhook_event.save(
+        update_fields=[
+            "status",
+            "last_error",
+            "next_attempt_at",
+            "processed_at",
+        ]
+    )
+    return handled
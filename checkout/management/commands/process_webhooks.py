@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from checkout.inbox import MAX_ATTEMPTS, claim_due_events, process_event
+from checkout.orders import purge_expired_carts
+
+# Seconds between purges of abandoned checkout carts
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Process Stripe webhook events stored by the webhook view, "
+        "retrying failed events with backoff, and purge the carts of "
+        "abandoned checkouts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the events that are due, then exit",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Number of events claimed at a time",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when no events are due",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=MAX_ATTEMPTS,
+            help="Attempts before an event is marked as failed",
+        )
+
+    def handle(self, *args, **options):
+        handled = failed = 0
+        purged_at = None
+        try:
+            while True:
+                now = time.monotonic()
+                if purged_at is None or now - purged_at >= PURGE_INTERVAL:
+                    purged = purge_expired_carts()
+                    purged_at = now
+                    if purged:
+                        self.stdout.write(
+                            f"Purged {purged} abandoned checkout carts"
+                        )
+                events = claim_due_events(options["batch_size"])
+                for webhook_event in events:
+                    if process_event(webhook_event, options["max_attempts"]):
+                        handled += 1
+                        self.stdout.write(f"Processed {webhook_event}")
+                    else:
+                        failed += 1
+                        self.stderr.write(
+                            f"Failed {webhook_event} (attempt "
+                            f"{webhook_event.attempts}, "
+                            f"{webhook_event.status}): "
+                            f"{webhook_event.last_error}"
+                        )
+                if not events:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {handled} webhook events, {failed} failed"
+            )
+        )
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clear_shared_pids(apps, schema_editor):
+    """
+    Store missing PaymentIntent ids as NULL, and keep each id only on
+    its earliest order, so the column can be made unique.
+    """
+    Order = apps.get_model("checkout", "Order")
+    Order.objects.filter(stripe_pid="").update(stripe_pid=None)
+    shared = (
+        Order.objects.exclude(stripe_pid=None)
+        .values("stripe_pid")
+        .annotate(orders=Count("id"))
+        .filter(orders__gt=1)
+        .values_list("stripe_pid", flat=True)
+    )
+    for pid in list(shared):
+        first = Order.objects.filter(stripe_pid=pid).order_by("date", "id")[0]
+        Order.objects.filter(stripe_pid=pid).exclude(pk=first.pk).update(
+            stripe_pid=None
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0009_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='stripe_pid',
+            field=models.CharField(
+                blank=True, default=None, max_length=254, null=True
+            ),
+        ),
+        migrations.RunPython(clear_shared_pids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='stripe_pid',
+            field=models.CharField(
+                blank=True, default=None, max_length=254, null=True,
+                unique=True
+            ),
+        ),
+    ]
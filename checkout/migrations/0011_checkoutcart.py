@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('checkout', '0010_order_stripe_pid_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutCart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_pid', models.CharField(max_length=254, unique=True)),
+                ('cart', models.JSONField()),
+                ('save_info', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:51
+
+import checkout.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0011_checkoutcart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoutcart',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, default=checkout.models.checkout_cart_expiry),
+        ),
+    ]
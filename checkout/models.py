@@ -1,5 +1,17 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# How long a saved checkout cart waits for its payment; well beyond the
+# webhook worker's retries, after which the checkout was abandoned
+CHECKOUT_CART_TTL = timedelta(days=7)
+
+
+def checkout_cart_expiry():
+    return timezone.now() + CHECKOUT_CART_TTL
 
 
 class Order(models.Model):
@@ -38,8 +50,9 @@ class Order(models.Model):
         max_digits=10, decimal_places=2, null=False, default=0
     )
     original_cart = models.TextField(null=False, blank=False, default="")
+    # One order per PaymentIntent; orders made without one hold NULL
     stripe_pid = models.CharField(
-        max_length=254, null=False, blank=False, default=""
+        max_length=254, null=True, blank=True, unique=True, default=None
     )
     payment_status = models.CharField(
         max_length=20,
@@ -68,13 +81,24 @@ class Order(models.Model):
 
         return f"{timestamp}-{unique_id}"
 
-    def update_total(self):
-        """Update grand total based on line items"""
-        self.order_total = sum(
-            lineitem.lineitem_total for lineitem in self.lineitems.all()
+    @classmethod
+    def update_totals(cls, order_ids):
+        """Recompute the totals of several orders in one UPDATE, summing
+        their line items in the database"""
+        line_totals = (
+            OrderLineItem.objects.filter(order=models.OuterRef("pk"))
+            .values("order")
+            .annotate(total=models.Sum("lineitem_total"))
+            .values("total")
+        )
+        total = Coalesce(
+            models.Subquery(line_totals),
+            models.Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        cls.objects.filter(pk__in=order_ids).update(
+            order_total=total, grand_total=total
         )
-        self.grand_total = self.order_total
-        self.save()
 
     def save(self, *args, **kwargs):
         """Override the original save method to set the order number"""
@@ -89,15 +113,16 @@ class Order(models.Model):
         """Check if the order has been paid"""
         return self.payment_status == "paid"
 
-    def update_payment_status(self, status):
-        """Update payment status"""
+    def update_payment_status(self, status, save=True):
+        """Update payment status, saving unless ``save`` is False"""
         from django.utils import timezone
 
         self.payment_status = status
 
         if status == "paid":
             self.payment_date = timezone.now()
-        self.save()
+        if save:
+            self.save()
 
 
 class OrderLineItem(models.Model):
@@ -135,3 +160,65 @@ class OrderLineItem(models.Model):
             f"License {self.product.model_number} on order "
             f"{self.order.order_number}"
         )
+
+
+class WebhookEvent(models.Model):
+    """A Stripe webhook event, stored on receipt and handled later by the
+    process_webhooks command"""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending"
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    received_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(
+        help_text="Earliest time the event may be processed (again)"
+    )
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="webhook_event_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
+
+
+class CheckoutCart(models.Model):
+    """The cart behind a PaymentIntent, saved just before the card is
+    charged so the webhook can build the order if the checkout view
+    never gets to"""
+
+    stripe_pid = models.CharField(max_length=254, unique=True)
+    cart = models.JSONField()
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    save_info = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Carts still here by then belong to abandoned checkouts and are
+    # purged by the process_webhooks worker
+    expires_at = models.DateTimeField(
+        default=checkout_cart_expiry, db_index=True
+    )
+
+    def __str__(self):
+        return self.stripe_pid
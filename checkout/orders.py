@@ -0,0 +1,113 @@
+"""
+Turning a session cart into an order.
+
+The order and all of its line items are written in one transaction:
+products are loaded together, line totals are priced up front so the
+line items can be bulk created, and the order is saved once with its
+totals already set.
+
+The checkout view and the Stripe webhook both save orders through
+``save_paid_order``. Orders are unique per PaymentIntent, so whichever
+arrives first creates the order and the other finds it.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import CheckoutCart, Order, OrderLineItem
+from products.pricing import load_products
+
+
+class CartError(ValueError):
+    """The cart can't be turned into an order; the message says why."""
+
+
+def create_order(order, cart, payment_status="paid"):
+    """
+    Save an unsaved ``order`` with a line item for each cart line.
+    Raises CartError, before anything is written, if a line is malformed
+    or its product no longer exists.
+    """
+    lines = list(cart.values())
+    if not all(
+        isinstance(item_data, dict) and "item_id" in item_data
+        for item_data in lines
+    ):
+        raise CartError(
+            "There was an error with your cart. Please try again."
+        )
+    products = load_products(item_data["item_id"] for item_data in lines)
+    line_items = []
+    for item_data in lines:
+        product = products.get(int(item_data["item_id"]))
+        if product is None:
+            raise CartError(
+                "One of the products in your cart wasn't found "
+                "in our database. Please call us for assistance!"
+            )
+        quantity = item_data["quantity"]
+        license_type = item_data["license_type"]
+        line_items.append(
+            OrderLineItem(
+                order=order,
+                product=product,
+                quantity=quantity,
+                license_type=license_type,
+                lineitem_total=(
+                    product.get_price_for_license(license_type) * quantity
+                ),
+            )
+        )
+
+    order.order_total = sum(item.lineitem_total for item in line_items)
+    order.grand_total = order.order_total
+    order.update_payment_status(payment_status, save=False)
+    with transaction.atomic():
+        order.save()
+        # bulk_create skips the line item signals, which would otherwise
+        # recount and resave the order once per line
+        OrderLineItem.objects.bulk_create(line_items)
+    return order
+
+
+def mark_order_paid(pid):
+    """Return the order for a PaymentIntent, marked as paid, or None."""
+    order = Order.objects.filter(stripe_pid=pid).first()
+    if order is not None and not order.is_paid():
+        order.update_payment_status("paid")
+    return order
+
+
+def save_paid_order(order, cart):
+    """
+    Save ``order`` for the cart as the paid order of its PaymentIntent,
+    ``order.stripe_pid``, unless that PaymentIntent already has one.
+    Returns ``(order, created)``.
+    """
+    pid = order.stripe_pid
+    if not pid:
+        return create_order(order, cart), True
+    existing = mark_order_paid(pid)
+    if existing is None:
+        try:
+            existing = create_order(order, cart)
+            created = True
+        except IntegrityError:
+            # Another request saved the order between the lookup and here
+            existing = mark_order_paid(pid)
+            if existing is None:
+                raise
+            created = False
+    else:
+        created = False
+    # The order exists now, so the webhook no longer needs the cart
+    CheckoutCart.objects.filter(stripe_pid=pid).delete()
+    return existing, created
+
+
+def purge_expired_carts():
+    """Delete the saved carts of abandoned checkouts; returns how many."""
+    deleted, _ = CheckoutCart.objects.filter(
+        expires_at__lte=timezone.now()
+    ).delete()
+    return deleted
@@ -0,0 +1,93 @@
+"""
+The Stripe PaymentIntent behind a checkout.
+
+One intent is kept per cart in the session, with a fingerprint of the
+cart it was priced for. Reloading the checkout page reuses it without
+calling Stripe, and a changed total modifies it rather than leaving an
+orphaned intent behind. An intent that already has an order, e.g. one
+the webhook saved after the browser went away, is never reused. Set
+``STRIPE_API_BASE`` to point the client at a local Stripe stand-in such
+as stripe-mock.
+"""
+
+import hashlib
+import json
+
+import stripe
+from django.conf import settings
+
+from .models import Order
+
+PAYMENT_INTENT_SESSION_KEY = "payment_intent"
+
+
+def configure_stripe():
+    """Point the Stripe client at the configured key and API."""
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+
+
+def cart_fingerprint(cart, amount):
+    """Hash the cart lines and the amount charged for them."""
+    lines = sorted(
+        (key, item.get("quantity"), item.get("license_type"))
+        for key, item in cart.items()
+        if isinstance(item, dict)
+    )
+    payload = json.dumps(
+        [lines, amount, settings.STRIPE_CURRENCY], default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_payment_intent(request, grand_total):
+    """
+    Return the client secret of a PaymentIntent for the session cart,
+    reusing the session's intent while the cart is unchanged and
+    modifying it when the total changes.
+    """
+    amount = round(grand_total * 100)
+    fingerprint = cart_fingerprint(request.session.get("cart", {}), amount)
+    stored = request.session.get(PAYMENT_INTENT_SESSION_KEY)
+    if stored and Order.objects.filter(stripe_pid=stored["id"]).exists():
+        # Paid already, so Stripe would refuse to charge it again
+        forget_payment_intent(request)
+        stored = None
+    if stored and stored["fingerprint"] == fingerprint:
+        return stored["client_secret"]
+
+    configure_stripe()
+    intent = None
+    if stored and stored["amount"] == amount:
+        intent = stored
+    elif stored:
+        try:
+            modified = stripe.PaymentIntent.modify(stored["id"], amount=amount)
+        except stripe.error.StripeError:
+            # Intents that were paid or cancelled can't change amount
+            modified = None
+        if modified is not None:
+            intent = {
+                "id": modified.id,
+                "client_secret": modified.client_secret,
+            }
+    if intent is None:
+        created = stripe.PaymentIntent.create(
+            amount=amount,
+            currency=settings.STRIPE_CURRENCY,
+        )
+        intent = {"id": created.id, "client_secret": created.client_secret}
+
+    request.session[PAYMENT_INTENT_SESSION_KEY] = {
+        "id": intent["id"],
+        "client_secret": intent["client_secret"],
+        "amount": amount,
+        "fingerprint": fingerprint,
+    }
+    return intent["client_secret"]
+
+
+def forget_payment_intent(request):
+    """Drop the session's intent once its order has been placed."""
+    request.session.pop(PAYMENT_INTENT_SESSION_KEY, None)
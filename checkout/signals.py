@@ -1,12 +1,46 @@
 """
 Handles signals for order updates when line items are created,
 updated, or deleted.
+
+Totals are recomputed once per order when the transaction commits, so
+saving N line items costs one UPDATE rather than N full recounts.
 """
 
+import threading
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import OrderLineItem
+from .models import Order, OrderLineItem
+
+
+# Order ids waiting for a total update, per thread as each thread has
+# its own database connection and so its own transaction
+_pending = threading.local()
+
+
+def _update_pending_totals():
+    """Update every pending order's totals; later callbacks find none"""
+    order_ids = getattr(_pending, "order_ids", None)
+    if order_ids:
+        _pending.order_ids = set()
+        Order.update_totals(order_ids)
+
+
+def schedule_total_update(order_id):
+    """
+    Recompute an order's totals when the current transaction commits,
+    or straight away outside a transaction. The first callback to run
+    updates every order touched in the transaction in one UPDATE.
+    """
+    if not hasattr(_pending, "order_ids"):
+        _pending.order_ids = set()
+    _pending.order_ids.add(order_id)
+    # Each change registers its own callback, so one dropped by a
+    # rolled back savepoint never stops the others; ids left over from
+    # a rollback are just recomputed with the next commit
+    transaction.on_commit(_update_pending_totals)
 
 
 @receiver(post_save, sender=OrderLineItem)
@@ -14,7 +48,7 @@ def update_on_save(sender, instance, created, **kwargs):
     """
     Update order total on lineitem update/create
     """
-    instance.order.update_total()
+    schedule_total_update(instance.order_id)
 
 
 @receiver(post_delete, sender=OrderLineItem)
@@ -22,4 +56,4 @@ def update_on_delete(sender, instance, **kwargs):
     """
     Update order total on lineitem delete
     """
-    instance.order.update_total()
+    schedule_total_update(instance.order_id)
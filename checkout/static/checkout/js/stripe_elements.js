@@ -2,7 +2,7 @@
 /* global $, Stripe */
 
 const stripePublicKey = JSON.parse(document.getElementById('id_stripe_public_key').textContent);
-const clientSecret = JSON.parse(document.getElementById('id_client_secret').textContent);
+const paymentIntentUrl = JSON.parse(document.getElementById('id_payment_intent_url').textContent);
 
 // Initialize Stripe with the public key
 const stripe = Stripe(stripePublicKey);
@@ -60,6 +60,48 @@ function showError(errorMessage) {
 // Get the payment form element
 const form = document.getElementById('payment-form');
 
+// The PaymentIntent is only fetched once the shopper starts entering
+// card details, so visitors who just look at the page never create one.
+// A failed fetch is retried on submit.
+let clientSecretRequest = null;
+
+function getClientSecret() {
+    if (!clientSecretRequest) {
+        const body = new FormData();
+        body.append('csrfmiddlewaretoken', $('input[name="csrfmiddlewaretoken"]').val());
+        clientSecretRequest = fetch(paymentIntentUrl, {
+            method: 'POST',
+            body: body,
+            credentials: 'same-origin',
+        }).then(response => response.json().then(data => {
+            if (!response.ok) {
+                throw new Error(data.error || response.statusText);
+            }
+            document.getElementById('id_client_secret_input').value = data.client_secret;
+            return data.client_secret;
+        })).catch(error => {
+            clientSecretRequest = null;
+            throw error;
+        });
+    }
+    return clientSecretRequest;
+}
+
+[cardNumber, cardExpiry, cardCvc].forEach(el => {
+    el.on('focus', () => getClientSecret().catch(() => {}));
+    el.on('change', () => getClientSecret().catch(() => {}));
+});
+
+// Re-enable the form after a failed payment attempt
+function resetForm() {
+    $('#payment-form').fadeToggle(100);
+    $('#loading-overlay').fadeToggle(100);
+    cardNumber.update({ disabled: false });
+    cardExpiry.update({ disabled: false });
+    cardCvc.update({ disabled: false });
+    document.getElementById('submit-button').disabled = false;
+}
+
 // Add form submission handler
 form.addEventListener('submit', function (ev) {
     ev.preventDefault(); // Stop normal form submission
@@ -87,28 +129,43 @@ form.addEventListener('submit', function (ev) {
     $('#payment-form').fadeToggle(100);
     $('#loading-overlay').fadeToggle(100);
 
-    // Gather data to be cached in the backend
-    const saveInfo = $('#id-save-info').prop('checked');
-    const csrfToken = $('input[name="csrfmiddlewaretoken"]').val();
-
-    const postData = {
-        csrfmiddlewaretoken: csrfToken,
-        client_secret: clientSecret,
-        save_info: saveInfo,
-    };
-
-    const url = '/checkout/cache_checkout_data/';
-
-    // Send cached data to the backend
-    $.post(url, postData).done(function () {
-        // Confirm the payment with Stripe
-        stripe.confirmCardPayment(clientSecret, {
-            payment_method: {
-                card: cardNumber,
-                billing_details: {
+    // Wait for the PaymentIntent if it hasn't arrived yet
+    getClientSecret().then(function (clientSecret) {
+        // Gather data to be cached in the backend
+        const saveInfo = $('#id-save-info').prop('checked');
+        const csrfToken = $('input[name="csrfmiddlewaretoken"]').val();
+
+        const postData = {
+            csrfmiddlewaretoken: csrfToken,
+            client_secret: clientSecret,
+            save_info: saveInfo,
+        };
+
+        const url = '/checkout/cache_checkout_data/';
+
+        // Send cached data to the backend
+        $.post(url, postData).done(function () {
+            // Confirm the payment with Stripe
+            stripe.confirmCardPayment(clientSecret, {
+                payment_method: {
+                    card: cardNumber,
+                    billing_details: {
+                        name: $.trim(form.full_name.value),
+                        phone: $.trim(form.phone_number.value),
+                        email: $.trim(form.email.value),
+                        address: {
+                            line1: $.trim(form.street_address1.value),
+                            line2: $.trim(form.street_address2.value),
+                            city: $.trim(form.town_or_city.value),
+                            state: $.trim(form.county.value),
+                            country: $.trim(form.country.value),
+                            postal_code: postcode
+                        }
+                    }
+                },
+                shipping: {
                     name: $.trim(form.full_name.value),
                     phone: $.trim(form.phone_number.value),
-                    email: $.trim(form.email.value),
                     address: {
                         line1: $.trim(form.street_address1.value),
                         line2: $.trim(form.street_address2.value),
@@ -118,38 +175,24 @@ form.addEventListener('submit', function (ev) {
                         postal_code: postcode
                     }
                 }
-            },
-            shipping: {
-                name: $.trim(form.full_name.value),
-                phone: $.trim(form.phone_number.value),
-                address: {
-                    line1: $.trim(form.street_address1.value),
-                    line2: $.trim(form.street_address2.value),
-                    city: $.trim(form.town_or_city.value),
-                    state: $.trim(form.county.value),
-                    country: $.trim(form.country.value),
-                    postal_code: postcode
-                }
-            }
-        }).then(function (result) {
-            if (result.error) {
-                // Show Stripe error and re-enable form elements
-                showError(result.error.message);
-                $('#payment-form').fadeToggle(100);
-                $('#loading-overlay').fadeToggle(100);
-                cardNumber.update({ disabled: false });
-                cardExpiry.update({ disabled: false });
-                cardCvc.update({ disabled: false });
-                document.getElementById('submit-button').disabled = false;
-            } else {
-                // Payment succeeded, submit form to complete process
-                if (result.paymentIntent.status === 'succeeded') {
-                    form.submit();
+            }).then(function (result) {
+                if (result.error) {
+                    // Show Stripe error and re-enable form elements
+                    showError(result.error.message);
+                    resetForm();
+                } else {
+                    // Payment succeeded, submit form to complete process
+                    if (result.paymentIntent.status === 'succeeded') {
+                        form.submit();
+                    }
                 }
-            }
+            });
+        }).fail(function () {
+            // Reload page on failure to post cached data
+            location.reload();
         });
-    }).fail(function () {
-        // Reload page on failure to post cached data
-        location.reload();
+    }).catch(function (error) {
+        showError(error.message);
+        resetForm();
     });
 });
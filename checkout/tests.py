@@ -0,0 +1,523 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+import stripe
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from .inbox import MAX_ATTEMPTS, SETTLE_SECONDS, record_event
+from .models import CheckoutCart, Order, OrderLineItem, WebhookEvent
+from .orders import (
+    create_order,
+    mark_order_paid,
+    purge_expired_carts,
+    save_paid_order,
+)
+from .webhook_handler import StripeWH_Handler
+from products.models import DigitalProduct
+
+
+def make_order(**fields):
+    return Order.objects.create(
+        full_name="Buyer",
+        email="buyer@example.com",
+        phone_number="+447700900123",
+        country="GB",
+        town_or_city="Town",
+        street_address1="Street",
+        **fields,
+    )
+
+
+class StripeStub:
+    """
+    A local stand-in for the PaymentIntent endpoints of the Stripe API.
+    ``calls`` records (path, form data) for every request; intents whose
+    id is in ``locked`` refuse changes, as paid intents do.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.intents = {}
+        self.locked = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = parse_qs(self.rfile.read(length).decode())
+                stub.calls.append((self.path, data))
+                status, body = stub.handle(self.path, data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps(body).encode())
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.calls.clear()
+        self.intents.clear()
+        self.locked.clear()
+
+    def handle(self, path, data):
+        if path == "/v1/payment_intents":
+            intent_id = f"pi_{len(self.intents) + 1}"
+            self.intents[intent_id] = {
+                "id": intent_id,
+                "object": "payment_intent",
+                "client_secret": f"{intent_id}_secret_test",
+                "status": "requires_payment_method",
+            }
+        else:
+            intent_id = path.rsplit("/", 1)[-1]
+            if intent_id not in self.intents or intent_id in self.locked:
+                return 400, {
+                    "error": {
+                        "type": "invalid_request_error",
+                        "message": "This PaymentIntent can't be changed.",
+                    }
+                }
+        intent = self.intents[intent_id]
+        if "amount" in data:
+            intent["amount"] = int(data["amount"][0])
+        return 200, intent
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StripeStubTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = StripeStub()
+        cls.stripe_settings = override_settings(
+            STRIPE_API_BASE=cls.stripe.url, STRIPE_SECRET_KEY="sk_test_stub"
+        )
+        cls.stripe_settings.enable()
+        cls.api_base = stripe.api_base
+
+    @classmethod
+    def tearDownClass(cls):
+        stripe.api_base = cls.api_base
+        cls.stripe_settings.disable()
+        cls.stripe.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.stripe.reset()
+        self.product = DigitalProduct.objects.create(
+            name="Alpha", base_price=Decimal("10.00")
+        )
+
+    def set_cart(self, quantity):
+        session = self.client.session
+        session["cart"] = {
+            f"{self.product.pk}_personal": {
+                "item_id": str(self.product.pk),
+                "quantity": quantity,
+                "license_type": "personal",
+            }
+        }
+        session.save()
+
+    def client_secret(self):
+        response = self.client.post(reverse("payment_intent"))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["client_secret"]
+
+
+class PaymentIntentTests(StripeStubTestCase):
+
+    def test_creates_an_intent_when_none_is_stored(self):
+        self.set_cart(2)
+        self.assertEqual(self.client_secret(), "pi_1_secret_test")
+        self.assertEqual(len(self.stripe.calls), 1)
+        path, data = self.stripe.calls[0]
+        self.assertEqual(path, "/v1/payment_intents")
+        self.assertEqual(data["amount"], ["2000"])
+
+    def test_reuses_the_intent_while_the_cart_is_unchanged(self):
+        self.set_cart(1)
+        first = self.client_secret()
+        self.assertEqual(self.client_secret(), first)
+        self.assertEqual(len(self.stripe.calls), 1)
+
+    def test_modifies_the_intent_when_the_amount_changes(self):
+        self.set_cart(1)
+        first = self.client_secret()
+        self.set_cart(3)
+        self.assertEqual(self.client_secret(), first)
+        path, data = self.stripe.calls[-1]
+        self.assertEqual(path, "/v1/payment_intents/pi_1")
+        self.assertEqual(data["amount"], ["3000"])
+        self.assertEqual(len(self.stripe.calls), 2)
+
+    def test_creates_a_new_intent_when_stripe_refuses_the_change(self):
+        self.set_cart(1)
+        self.client_secret()
+        self.stripe.locked.add("pi_1")
+        self.set_cart(2)
+        self.assertEqual(self.client_secret(), "pi_2_secret_test")
+
+    def test_never_reuses_an_intent_that_has_an_order(self):
+        self.set_cart(1)
+        self.client_secret()
+        # The webhook saved the order, so the session still has the intent
+        make_order(stripe_pid="pi_1")
+        self.assertEqual(self.client_secret(), "pi_2_secret_test")
+        self.assertEqual(self.stripe.calls[-1][0], "/v1/payment_intents")
+
+
+class OrderTotalTests(TestCase):
+
+    def setUp(self):
+        self.product = DigitalProduct.objects.create(
+            name="Alpha", base_price=Decimal("10.00")
+        )
+
+    def add_lines(self, order, count):
+        for _ in range(count):
+            OrderLineItem.objects.create(
+                order=order,
+                product=self.product,
+                quantity=1,
+                license_type="indie",
+            )
+
+    def test_totals_are_recomputed_once_per_transaction(self):
+        first = make_order()
+        second = make_order()
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.add_lines(first, 5)
+                self.add_lines(second, 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        # One UPDATE, with the line item SUM as a subquery, covers both
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(
+            queries[0]["sql"].startswith('UPDATE "checkout_order"')
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.grand_total, Decimal("57.50"))
+        self.assertEqual(second.grand_total, Decimal("23.00"))
+
+    def test_deleting_a_line_updates_the_total(self):
+        order = make_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_lines(order, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.lineitems.first().delete()
+        order.refresh_from_db()
+        self.assertEqual(order.order_total, Decimal("11.50"))
+
+
+def stripe_event(event_id="evt_1", pid="pi_1"):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "payment_intent.succeeded",
+        "data": {"object": {"id": pid, "object": "payment_intent"}},
+    }
+
+
+@override_settings(STRIPE_WH_SECRET="whsec_test")
+class WebhookInboxTests(TestCase):
+
+    def post_event(self, event):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            b"whsec_test",
+            f"{timestamp}.{payload}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        return self.client.post(
+            reverse("webhook"),
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+
+    def process_due_events(self):
+        WebhookEvent.objects.update(next_attempt_at=timezone.now())
+        call_command(
+            "process_webhooks", "--once", stdout=StringIO(), stderr=StringIO()
+        )
+        return WebhookEvent.objects.get()
+
+    @mock.patch(
+        "checkout.webhook_handler.StripeWH_Handler."
+        "handle_payment_intent_succeeded"
+    )
+    def test_endpoint_queues_the_event_without_handling_it(self, handle):
+        response = self.post_event(stripe_event())
+        self.assertEqual(response.status_code, 200)
+        handle.assert_not_called()
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.event_id, "evt_1")
+        self.assertEqual(event.status, "pending")
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+    def test_endpoint_rejects_a_bad_signature(self):
+        response = self.client.post(
+            reverse("webhook"),
+            json.dumps(stripe_event()),
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE="t=1,v1=bad",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_redelivered_events_are_stored_once(self):
+        self.post_event(stripe_event())
+        response = self.post_event(stripe_event())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Duplicate ignored", response.content)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertFalse(record_event(stripe_event()))
+
+    @mock.patch(
+        "checkout.webhook_handler.StripeWH_Handler."
+        "handle_payment_intent_succeeded"
+    )
+    def test_failed_events_are_retried_with_backoff(self, handle):
+        handle.return_value = HttpResponse("No cart saved", status=500)
+        record_event(stripe_event())
+
+        event = self.process_due_events()
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("No cart saved", event.last_error)
+        delay = event.next_attempt_at - timezone.now()
+        self.assertAlmostEqual(
+            delay.total_seconds(), SETTLE_SECONDS * 2, delta=1
+        )
+
+        handle.return_value = HttpResponse(status=200)
+        event = self.process_due_events()
+        self.assertEqual(event.status, "done")
+        self.assertEqual(event.attempts, 2)
+        self.assertIsNotNone(event.processed_at)
+
+    @mock.patch(
+        "checkout.webhook_handler.StripeWH_Handler."
+        "handle_payment_intent_succeeded"
+    )
+    def test_events_fail_after_the_last_attempt(self, handle):
+        handle.side_effect = RuntimeError("boom")
+        record_event(stripe_event())
+        WebhookEvent.objects.update(attempts=MAX_ATTEMPTS - 1)
+
+        event = self.process_due_events()
+        self.assertEqual(event.status, "failed")
+        self.assertEqual(event.last_error, "RuntimeError: boom")
+
+    def test_events_wait_until_they_are_due(self):
+        record_event(stripe_event())
+        call_command("process_webhooks", "--once", stdout=StringIO())
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.attempts, 0)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+
+class CheckoutCartTests(StripeStubTestCase):
+
+    def cache_checkout_data(self, secret, save_info="false"):
+        response = self.client.post(
+            reverse("cache_checkout_data"),
+            {"client_secret": secret, "save_info": save_info},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_resubmitting_updates_the_saved_cart(self):
+        self.set_cart(1)
+        secret = self.client_secret()
+        self.cache_checkout_data(secret)
+        CheckoutCart.objects.update(expires_at=timezone.now())
+
+        self.set_cart(3)
+        self.cache_checkout_data(secret, save_info="true")
+        checkout_cart = CheckoutCart.objects.get()
+        self.assertEqual(checkout_cart.stripe_pid, "pi_1")
+        self.assertEqual(
+            list(checkout_cart.cart.values())[0]["quantity"], 3
+        )
+        self.assertTrue(checkout_cart.save_info)
+        self.assertGreater(checkout_cart.expires_at, timezone.now())
+
+    def test_only_expired_carts_are_purged(self):
+        CheckoutCart.objects.create(stripe_pid="pi_old", cart={})
+        CheckoutCart.objects.create(stripe_pid="pi_new", cart={})
+        CheckoutCart.objects.filter(stripe_pid="pi_old").update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(purge_expired_carts(), 1)
+        self.assertEqual(
+            list(CheckoutCart.objects.values_list("stripe_pid", flat=True)),
+            ["pi_new"],
+        )
+
+    def test_the_worker_purges_expired_carts(self):
+        CheckoutCart.objects.create(
+            stripe_pid="pi_old",
+            cart={},
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        out = StringIO()
+        call_command("process_webhooks", "--once", stdout=out)
+        self.assertFalse(CheckoutCart.objects.exists())
+        self.assertIn("Purged 1 abandoned checkout carts", out.getvalue())
+
+
+class SavePaidOrderTests(TestCase):
+
+    def setUp(self):
+        self.product = DigitalProduct.objects.create(
+            name="Alpha", base_price=Decimal("10.00")
+        )
+        self.cart = {
+            f"{self.product.pk}_personal": {
+                "item_id": str(self.product.pk),
+                "quantity": 2,
+                "license_type": "personal",
+            }
+        }
+        CheckoutCart.objects.create(stripe_pid="pi_1", cart=self.cart)
+
+    def unsaved_order(self):
+        return Order(
+            full_name="Buyer",
+            email="buyer@example.com",
+            phone_number="+447700900123",
+            country="GB",
+            town_or_city="Town",
+            street_address1="Street",
+            stripe_pid="pi_1",
+        )
+
+    def test_the_second_caller_finds_the_first_order(self):
+        first, created = save_paid_order(self.unsaved_order(), self.cart)
+        self.assertTrue(created)
+        second, created = save_paid_order(self.unsaved_order(), self.cart)
+        self.assertFalse(created)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(OrderLineItem.objects.count(), 1)
+        self.assertFalse(CheckoutCart.objects.exists())
+
+    def test_a_racing_caller_falls_back_to_the_saved_order(self):
+        # The other caller saves its order after this one's lookup found
+        # nothing, so this one's insert hits the unique stripe_pid
+        winner = create_order(self.unsaved_order(), self.cart, "pending")
+        lookups = []
+
+        def racing_lookup(pid):
+            lookups.append(pid)
+            return None if len(lookups) == 1 else mark_order_paid(pid)
+
+        with mock.patch(
+            "checkout.orders.mark_order_paid", side_effect=racing_lookup
+        ):
+            order, created = save_paid_order(self.unsaved_order(), self.cart)
+
+        self.assertFalse(created)
+        self.assertEqual(order.pk, winner.pk)
+        self.assertTrue(order.is_paid())
+        self.assertEqual(lookups, ["pi_1", "pi_1"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderLineItem.objects.count(), 1)
+        self.assertFalse(CheckoutCart.objects.exists())
+
+
+def succeeded_event(pid="pi_1"):
+    address = {
+        "city": "Town",
+        "country": "GB",
+        "line1": "Street",
+        "line2": "",
+        "postal_code": "AB1 2CD",
+        "state": "",
+    }
+    event = stripe_event(pid=pid)
+    event["data"]["object"].update(
+        charges={
+            "object": "list",
+            "data": [{"billing_details": {"email": "buyer@example.com"}}],
+        },
+        shipping={
+            "name": "Buyer",
+            "phone": "+447700900123",
+            "address": address,
+        },
+    )
+    return stripe.Event.construct_from(event, "sk_test")
+
+
+@mock.patch.object(StripeWH_Handler, "_send_confirmation_email")
+class WebhookOrderTests(TestCase):
+
+    def setUp(self):
+        self.product = DigitalProduct.objects.create(
+            name="Alpha", base_price=Decimal("10.00")
+        )
+        self.cart = {
+            f"{self.product.pk}_personal": {
+                "item_id": str(self.product.pk),
+                "quantity": 1,
+                "license_type": "personal",
+            }
+        }
+
+    def test_creates_the_order_from_the_saved_cart(self, send_email):
+        CheckoutCart.objects.create(stripe_pid="pi_1", cart=self.cart)
+        response = StripeWH_Handler().handle_payment_intent_succeeded(
+            succeeded_event()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Created order in webhook", response.content)
+        order = Order.objects.get(stripe_pid="pi_1")
+        self.assertTrue(order.is_paid())
+        self.assertEqual(order.street_address2, None)
+        self.assertEqual(order.lineitems.count(), 1)
+        self.assertFalse(CheckoutCart.objects.exists())
+        send_email.assert_called_once_with(order)
+
+    def test_fails_without_a_saved_cart_so_the_event_is_retried(
+        self, send_email
+    ):
+        response = StripeWH_Handler().handle_payment_intent_succeeded(
+            succeeded_event()
+        )
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Order.objects.exists())
+        send_email.assert_not_called()
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from .webhooks import webhook
 
 urlpatterns = [
     path("", views.checkout, name="checkout"),
@@ -8,6 +9,12 @@ urlpatterns = [
         views.checkout_success,
         name="checkout_success",
     ),
+    path(
+        "payment_intent/",
+        views.payment_intent,
+        name="payment_intent",
+    ),
+    path("wh/", webhook, name="webhook"),
     path(
         "cache_checkout_data/",
         views.cache_checkout_data,
@@ -9,24 +9,33 @@ from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.http import JsonResponse
 
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from products.models import DigitalProduct
 
 from .forms import OrderForm
-from .models import Order, OrderLineItem
+from .models import CheckoutCart, Order, checkout_cart_expiry
+from .orders import CartError, save_paid_order
+from .payments import (
+    configure_stripe,
+    forget_payment_intent,
+    get_payment_intent,
+)
 from cart.inventory import cart_contents
 
 import stripe
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 @require_POST
 def cache_checkout_data(request):
     try:
         pid = request.POST.get("client_secret").split("_secret")[0]
-        stripe.api_key = settings.STRIPE_SECRET_KEY
+        configure_stripe()
 
         cart = request.session.get("cart", {})
 
@@ -50,6 +59,20 @@ def cache_checkout_data(request):
                 "username": str(request.user),
             },
         )
+
+        # Keep the full cart server-side, keyed by the PaymentIntent, so
+        # the webhook can create the order if this browser never returns
+        CheckoutCart.objects.update_or_create(
+            stripe_pid=pid,
+            defaults={
+                "cart": cart,
+                "user": (
+                    request.user if request.user.is_authenticated else None
+                ),
+                "save_info": request.POST.get("save_info") == "true",
+                "expires_at": checkout_cart_expiry(),
+            },
+        )
         return HttpResponse(status=200)
     except Exception as e:
         messages.error(
@@ -62,9 +85,29 @@ def cache_checkout_data(request):
         return HttpResponse(content=e, status=400)
 
 
+@require_POST
+def payment_intent(request):
+    """
+    Return the client secret of the cart's PaymentIntent. The checkout
+    page fetches it after loading, so rendering never waits on Stripe.
+    Repeat calls for an unchanged cart reuse the same intent.
+    """
+    current_cart = cart_contents(request)
+    if not current_cart["cart_items"]:
+        return JsonResponse({"error": "Your cart is empty."}, status=400)
+    try:
+        client_secret = get_payment_intent(
+            request, current_cart["grand_total"]
+        )
+    except stripe.error.StripeError:
+        return JsonResponse(
+            {"error": "Payment is unavailable right now."}, status=502
+        )
+    return JsonResponse({"client_secret": client_secret})
+
+
 def checkout(request):
     stripe_public_key = settings.STRIPE_PUBLIC_KEY
-    stripe_secret_key = settings.STRIPE_SECRET_KEY
 
     if request.method == "POST":
         cart = request.session.get("cart", {})
@@ -94,53 +137,23 @@ def checkout(request):
                 pid = ""
             if pid:
                 order.stripe_pid = pid
-            # Save after setting stripe_pid/user
-            order.save()
-            order.update_payment_status("paid")
-
-            print(
-                f"DEBUG: Created order {order.order_number} "
-                f"with stripe_pid: '{order.stripe_pid}'"
+            # Save the order and its line items in one transaction, or
+            # use the order the webhook already saved for this payment
+            try:
+                order, created = save_paid_order(order, cart)
+            except CartError as error:
+                messages.error(request, str(error))
+                return redirect(reverse("view_cart"))
+
+            logger.debug(
+                "%s order %s with stripe_pid %r",
+                "Created" if created else "Found",
+                order.order_number,
+                order.stripe_pid,
             )
 
-            for cart_key, item_data in cart.items():
-                try:
-                    if isinstance(item_data, dict) and "item_id" in item_data:
-                        product = DigitalProduct.objects.get(
-                            id=item_data["item_id"]
-                        )
-                        order_line_item = OrderLineItem(
-                            order=order,
-                            product=product,
-                            quantity=item_data["quantity"],
-                            license_type=item_data["license_type"],
-                        )
-                        order_line_item.save()
-                    else:
-                        messages.error(
-                            request,
-                            (
-                                "There was an error with your cart. "
-                                "Please try again."
-                            ),
-                        )
-                        order.delete()
-                        return redirect(reverse("view_cart"))
-                except DigitalProduct.DoesNotExist:
-                    messages.error(
-                        request,
-                        (
-                            "One of the products in your cart wasn't found "
-                            "in our database. Please call us for assistance!"
-                        ),
-                    )
-                    order.delete()
-                    return redirect(reverse("view_cart"))
-
-            # Update the order total after all line items are created
-            order.update_total()
-
             request.session["save_info"] = "save-info" in request.POST
+            forget_payment_intent(request)
             return redirect(
                 reverse("checkout_success", args=[order.order_number])
             )
@@ -154,13 +167,6 @@ def checkout(request):
             )
 
             current_cart = cart_contents(request)
-            total = current_cart["grand_total"]
-            stripe_total = round(total * 100)
-            stripe.api_key = stripe_secret_key
-            intent = stripe.PaymentIntent.create(
-                amount=stripe_total,
-                currency=settings.STRIPE_CURRENCY,
-            )
 
             return render(
                 request,
@@ -168,7 +174,7 @@ def checkout(request):
                 {
                     "order_form": order_form,
                     "stripe_public_key": stripe_public_key,
-                    "client_secret": intent.client_secret,
+                    "payment_intent_url": reverse("payment_intent"),
                     "cart_items": current_cart["cart_items"],
                     "total": current_cart["subtotal"],
                     "grand_total": current_cart["grand_total"],
@@ -194,13 +200,6 @@ def checkout(request):
             )
 
         current_cart = cart_contents(request)
-        total = current_cart["grand_total"]
-        stripe_total = round(total * 100)
-        stripe.api_key = stripe_secret_key
-        intent = stripe.PaymentIntent.create(
-            amount=stripe_total,
-            currency=settings.STRIPE_CURRENCY,
-        )
 
         order_form = OrderForm()
 
@@ -217,7 +216,7 @@ def checkout(request):
         context = {
             "order_form": order_form,
             "stripe_public_key": stripe_public_key,
-            "client_secret": intent.client_secret,
+            "payment_intent_url": reverse("payment_intent"),
             "cart_items": current_cart["cart_items"],
             "total": current_cart["subtotal"],
             "grand_total": current_cart["grand_total"],
@@ -269,6 +268,7 @@ def checkout_success(request, order_number):
 
     if "cart" in request.session:
         del request.session["cart"]
+    forget_payment_intent(request)
 
     template = "checkout/checkout_success.html"
     context = {
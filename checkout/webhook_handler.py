@@ -7,40 +7,50 @@ from django.conf import settings
 
 # Import app-specific models
 
-from .models import Order, OrderLineItem
-from products.models import DigitalProduct
+from .models import CheckoutCart, Order
+from .orders import CartError, mark_order_paid, save_paid_order
 from profiles.models import UserProfile
 
 import json
-import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class StripeWH_Handler:
     """Class to handle Stripe webhooks"""
 
-    def __init__(self, request):
-        """Initialize with the request object"""
+    def __init__(self, request=None):
+        """Initialize with the request object, if there is one"""
         self.request = request
 
     def _send_confirmation_email(self, order):
         """Send order confirmation email to the customer"""
         cust_email = order.email
 
-        # Render email subject and body from templates using the order context
-        subject = render_to_string(
-            "checkout/confirmation_emails/confirmation_email_subject.txt",
-            {"order": order},
-        )
-        body = render_to_string(
-            "checkout/confirmation_emails/confirmation_email_body.txt",
-            {
-                "order": order,
-                "contact_email": settings.DEFAULT_FROM_EMAIL,
-            },
-        )
+        # The order is saved by now, so a failed email mustn't make the
+        # event be retried, which would repeat the order work
+        try:
+            # Render email subject and body from templates using the
+            # order context
+            subject = render_to_string(
+                "checkout/confirmation_emails/confirmation_email_subject.txt",
+                {"order": order},
+            )
+            body = render_to_string(
+                "checkout/confirmation_emails/confirmation_email_body.txt",
+                {
+                    "order": order,
+                    "contact_email": settings.DEFAULT_FROM_EMAIL,
+                },
+            )
 
-        # Send the email
-        send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [cust_email])
+            # Send the email
+            send_mail(
+                subject, body, settings.DEFAULT_FROM_EMAIL, [cust_email]
+            )
+        except Exception:
+            logger.exception("Confirmation email for order %s not sent", order)
 
     def handle_event(self, event):
         """Handle unexpected or unknown webhook events from Stripe"""
@@ -53,125 +63,14 @@ class StripeWH_Handler:
         """Handle successful payment_intent.succeeded events from Stripe"""
         intent = event.data.object
         pid = intent.id
-        cart = intent.metadata.cart
-        save_info = intent.metadata.save_info
-
-        print(f"DEBUG: Webhook received for payment intent {pid}")
-        print(f"DEBUG: Cart: {cart}")
-
-        billing_details = intent.charges.data[0].billing_details
-        shipping_details = intent.shipping
-        grand_total = round(intent.charges.data[0].amount / 100, 2)
 
-        print(f"DEBUG: Billing email: {billing_details.email}")
-        print(f"DEBUG: Grand total: {grand_total}")
-        print(f"DEBUG: Shipping name: {shipping_details.name}")
+        logger.debug("Webhook received for payment intent %s", pid)
 
-        # Check existing orders
-        existing_orders = Order.objects.filter(
-            email__iexact=billing_details.email,
-            stripe_pid="",
-        )
-        print(
-            "DEBUG: Found "
-            f"{existing_orders.count()} orders with email "
-            f"{billing_details.email} and empty stripe_pid"
-        )
-        for order in existing_orders:
-            print(
-                f"DEBUG: Order {order.order_number} - "
-                f"Total: {order.grand_total}, "
-                f"Stripe PID: '{order.stripe_pid}'"
-            )
-
-        for field, value in shipping_details.address.items():
-            if value == "":
-                shipping_details.address[field] = None
-
-        profile = None
-        username = intent.metadata.username
-        if username != "AnonymousUser":
-            try:
-                profile = UserProfile.objects.get(user__username=username)
-                if save_info:
-                    profile.default_country = (
-                        shipping_details.address.country
-                    )
-                    profile.default_phone_number = shipping_details.phone
-                    profile.default_postcode = (
-                        shipping_details.address.postal_code
-                    )
-                    profile.default_town_or_city = (
-                        shipping_details.address.city
-                    )
-                    profile.default_street_address1 = (
-                        shipping_details.address.line1
-                    )
-                    profile.default_street_address2 = (
-                        shipping_details.address.line2
-                    )
-                    profile.default_county = shipping_details.address.state
-                    profile.save()
-            except UserProfile.DoesNotExist:
-                profile = None
-
-        order_exists = False
-        attempt = 1
-        while attempt <= 5:
-            try:
-                # First try to find order by stripe_pid
-                order = Order.objects.get(stripe_pid=pid)
-                order_exists = True
-                break
-            except Order.DoesNotExist:
-                # If not found by stripe_pid, try by email and grand_total
-                try:
-                    order = Order.objects.get(
-                        email__iexact=billing_details.email,
-                        grand_total=grand_total,
-                        stripe_pid="",  # Look for empty stripe_pid
-                    )
-                    order.stripe_pid = pid
-                    order.update_payment_status("paid")
-                    print(
-                        f"DEBUG: Updated existing order {order.order_number} "
-                        f"with stripe_pid {pid} - Status set to PAID"
-                    )
-                    print(
-                        f"DEBUG: Order stripe_pid after save: "
-                        f"'{order.stripe_pid}'"
-                    )
-                    order_exists = True
-                    break
-                except Order.DoesNotExist:
-                    # Try to find any order with same email & total
-                    try:
-                        order = Order.objects.filter(
-                            email__iexact=billing_details.email,
-                            grand_total=grand_total,
-                        ).first()
-                        if order:
-                            order.stripe_pid = pid
-                            order.update_payment_status("paid")
-                            print(
-                                f"DEBUG: Updated any order "
-                                f"{order.order_number} with stripe_pid {pid} "
-                                "- Status set to PAID"
-                            )
-                            print(
-                                f"DEBUG: Order stripe_pid after save: "
-                                f"'{order.stripe_pid}'"
-                            )
-                            order_exists = True
-                            break
-                    except Exception as e:
-                        print(f"DEBUG: Error updating order: {e}")
-                        pass
-                attempt += 1
-                time.sleep(1)
-
-        if order_exists:
-            print(f"DEBUG: Order found and updated: {order.order_number}")
+        # Orders are unique per PaymentIntent, so one indexed lookup
+        # finds the order the checkout view saved
+        order = mark_order_paid(pid)
+        if order is not None:
+            logger.debug("Order %s found and marked paid", order)
             self._send_confirmation_email(order)
             return HttpResponse(
                 content=(
@@ -180,63 +79,83 @@ class StripeWH_Handler:
                 ),
                 status=200,
             )
-        else:
-            order = None
-            try:
-                user = profile.user if profile else None
-                order = Order.objects.create(
-                    full_name=shipping_details.name,
-                    user=user,
-                    email=billing_details.email,
-                    phone_number=shipping_details.phone,
-                    country=shipping_details.address.country,
-                    postcode=shipping_details.address.postal_code,
-                    town_or_city=shipping_details.address.city,
-                    street_address1=shipping_details.address.line1,
-                    street_address2=shipping_details.address.line2,
-                    county=shipping_details.address.state,
-                    grand_total=grand_total,
-                    original_cart=cart,
-                    stripe_pid=pid,
-                )
 
-                order.update_payment_status("paid")
-                print(
-                    f"DEBUG: New order {order.order_number} "
-                    "created with PAID status"
-                )
+        # The cart was saved by cache_checkout_data just before the card
+        # was charged
+        checkout_cart = (
+            CheckoutCart.objects.filter(stripe_pid=pid)
+            .select_related("user")
+            .first()
+        )
+        if checkout_cart is None:
+            return HttpResponse(
+                content=(
+                    f'Webhook received: {event["type"]} | ERROR: '
+                    f"No cart saved for {pid}"
+                ),
+                status=500,
+            )
+
+        billing_details = intent.charges.data[0].billing_details
+        shipping_details = intent.shipping
+
+        for field, value in shipping_details.address.items():
+            if value == "":
+                shipping_details.address[field] = None
 
-                for item_id, item_data in json.loads(cart).items():
-                    product = DigitalProduct.objects.get(id=item_id)
-                    if isinstance(item_data, dict):
-                        order_line_item = OrderLineItem(
-                            order=order,
-                            product=product,
-                            quantity=item_data["quantity"],
-                            license_type=item_data["license_type"],
-                        )
-                        order_line_item.save()
-                    else:
-                        order_line_item = OrderLineItem(
-                            order=order,
-                            product=product,
-                            quantity=item_data,
-                        )
-                        order_line_item.save()
-            except Exception as e:
-                if order:
-                    order.delete()
-                return HttpResponse(
-                    content=f'Webhook received: {event["type"]} | ERROR: {e}',
-                    status=500,
+        user = checkout_cart.user
+        if user is not None and checkout_cart.save_info:
+            profile = UserProfile.objects.filter(user=user).first()
+            if profile is not None:
+                profile.default_country = shipping_details.address.country
+                profile.default_phone_number = shipping_details.phone
+                profile.default_postcode = (
+                    shipping_details.address.postal_code
+                )
+                profile.default_town_or_city = shipping_details.address.city
+                profile.default_street_address1 = (
+                    shipping_details.address.line1
+                )
+                profile.default_street_address2 = (
+                    shipping_details.address.line2
                 )
+                profile.default_county = shipping_details.address.state
+                profile.save()
+
+        order = Order(
+            full_name=shipping_details.name,
+            user=user,
+            email=billing_details.email,
+            phone_number=shipping_details.phone,
+            country=shipping_details.address.country,
+            postcode=shipping_details.address.postal_code,
+            town_or_city=shipping_details.address.city,
+            street_address1=shipping_details.address.line1,
+            street_address2=shipping_details.address.line2,
+            county=shipping_details.address.state,
+            original_cart=json.dumps(checkout_cart.cart),
+            stripe_pid=pid,
+        )
+        try:
+            order, created = save_paid_order(order, checkout_cart.cart)
+        except CartError as e:
+            return HttpResponse(
+                content=f'Webhook received: {event["type"]} | ERROR: {e}',
+                status=500,
+            )
 
+        logger.debug(
+            "Order %s %s with paid status",
+            order,
+            "created" if created else "found",
+        )
         self._send_confirmation_email(order)
+        if created:
+            outcome = "Created order in webhook"
+        else:
+            outcome = "Verified order already in database"
         return HttpResponse(
-            content=(
-                f'Webhook received: {event["type"]} | SUCCESS: '
-                "Created order in webhook"
-            ),
+            content=f'Webhook received: {event["type"]} | SUCCESS: {outcome}',
             status=200,
         )
 
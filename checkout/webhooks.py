@@ -6,8 +6,9 @@ from django.conf import settings
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
-from checkout.webhook_handler import StripeWH_Handler
+from checkout.inbox import record_event
 
+import json
 import stripe
 
 
@@ -39,23 +40,15 @@ def webhook(request):
     except Exception as e:
         return HttpResponse(content=e, status=400)
 
-    # Set up a webhook handler
-    handler = StripeWH_Handler(request)
-
-    # Map webhook events to relevant handler functions
-    event_map = {
-        "payment_intent.succeeded":
-            handler.handle_payment_intent_succeeded,
-        "payment_intent.payment_failed":
-            handler.handle_payment_intent_payment_failed,
-    }
-
-    # Get the webhook type from Stripe
-    event_type = event["type"]
-
-    # Get the appropriate handler or use default
-    event_handler = event_map.get(event_type, handler.handle_event)
-
-    # Call the handler and return its response
-    response = event_handler(event)
-    return response
+    # Store the event and answer straight away; the process_webhooks
+    # command handles it. Stripe redelivers events it gets no answer
+    # for, so duplicates are expected and dropped by event id
+    if record_event(json.loads(payload)):
+        return HttpResponse(
+            content=f'Webhook received: {event["type"]} | Queued',
+            status=200,
+        )
+    return HttpResponse(
+        content=f'Webhook received: {event["type"]} | Duplicate ignored',
+        status=200,
+    )
@@ -1,3 +1,46 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from products import context_processors
+from products.models import Category
+
+
+class CategoryMenuTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.avatars = Category.objects.create(name="avatars")
+        self.games = Category.objects.create(name="games")
+        self.fantasy = Category.objects.create(
+            name="fantasy", parent=self.avatars
+        )
+        context_processors._local_menu = (None, [], 0.0)
+
+    def menu(self):
+        return list(self.client.get(reverse("faq_list")).context["categories"])
+
+    def test_menu_lists_the_tree_depth_first(self):
+        self.assertEqual(
+            self.menu(), [self.avatars, self.fantasy, self.games]
+        )
+
+    def test_menu_follows_a_reparented_category(self):
+        self.menu()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fantasy.parent = self.games
+            self.fantasy.save()
+        # Skip the once-a-second wait before the version is re-read
+        with mock.patch.object(
+            context_processors, "VERSION_CHECK_INTERVAL", 0
+        ):
+            self.assertEqual(
+                self.menu(), [self.avatars, self.games, self.fantasy]
+            )
 
-# Create your tests here.
+    def test_warm_menu_costs_no_queries(self):
+        self.menu()
+        with self.assertNumQueries(0):
+            context_processors.get_category_menu()
@@ -2,11 +2,14 @@ from django.contrib import admin
 from django.utils.html import format_html
 from .models import DigitalProduct, Category
 from django import forms
+from avagen.images import ImageDerivativesFormMixin
 
 
-class DigitalProductAdminForm(forms.ModelForm):
+class DigitalProductAdminForm(ImageDerivativesFormMixin, forms.ModelForm):
     """Custom form for DigitalProduct with proper image field configuration"""
 
+    derivative_fields = {"image": "image_derivatives"}
+
     class Meta:
         model = DigitalProduct
         fields = [
@@ -73,6 +76,12 @@ class DigitalProductAdmin(admin.ModelAdmin):
 
     readonly_fields = ("created_at", "modified_at", "image_preview")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # The admin saves its form with commit=False, so the form can't
+        # schedule the image derivatives itself
+        form.schedule_image_derivatives()
+
     def image_preview(self, obj):
         """Display thumbnail preview of image"""
         if obj.image:
@@ -126,6 +135,7 @@ class CategoryAdmin(admin.ModelAdmin):
     list_editable = ("is_creator",)
     list_filter = ("is_creator", "parent")
     search_fields = ("name", "friendly_name")
+    ordering = ("path",)
 
     fieldsets = (
         ("Basic Information", {"fields": ("name", "friendly_name")}),
@@ -0,0 +1,152 @@
+"""
+Read-only JSON API for the product catalog.
+
+Responses carry an ``ETag`` and ``Last-Modified`` built from the catalog
+version and the time it was last bumped, so pollers that send
+``If-None-Match`` or ``If-Modified-Since`` get a 304 before anything is
+serialised. Any change that invalidates cached catalog pages also moves
+both validators on. The validators are cached per catalog version in
+the memory cache (see CACHES in settings), so answering a 304 takes a
+few cache reads and no database queries.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from .cache import (
+    LISTING_CACHE_TIMEOUT,
+    get_catalog_modified,
+    get_catalog_version,
+)
+from .listing import filter_products, get_listing_page, load_page
+from .models import Category, DigitalProduct
+
+
+def catalog_validators():
+    """
+    Return the catalog version, the time the catalog last changed, and
+    the number of published products.
+    """
+    version = get_catalog_version()
+    key = f"catalog:validators:{version}"
+    validators = cache.get(key)
+    if validators is None:
+        products = DigitalProduct.objects.filter(
+            status="published"
+        ).aggregate(count=Count("id"))
+        validators = {
+            "version": version,
+            "last_modified": get_catalog_modified(version),
+            "count": products["count"],
+        }
+        cache.set(key, validators, LISTING_CACHE_TIMEOUT)
+    return validators
+
+
+def _catalog_etag(request):
+    validators = catalog_validators()
+    parts = [
+        validators["version"],
+        validators["last_modified"],
+        validators["count"],
+        request.path,
+        sorted(request.GET.lists()),
+    ]
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _catalog_last_modified(request):
+    return catalog_validators()["last_modified"]
+
+
+def _absolute_query(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query["cursor"] = cursor
+    return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+
+def _serialise_product(request, product):
+    if product.image_url:
+        image = product.image_url
+    elif product.image:
+        image = request.build_absolute_uri(product.image.url)
+    else:
+        image = None
+    return {
+        "id": product.pk,
+        "name": product.name,
+        "description": product.description,
+        "model_number": product.model_number,
+        "category": product.category.name if product.category else None,
+        "base_price": str(product.base_price),
+        "prices": {
+            license_type: str(price)
+            for license_type, price in product.license_prices.items()
+        },
+        "rating": str(product.rating) if product.review_count else None,
+        "review_count": product.review_count,
+        "image": image,
+        "url": request.build_absolute_uri(
+            reverse("product_detail", args=[product.pk])
+        ),
+        "modified_at": product.modified_at.isoformat(),
+    }
+
+
+@require_GET
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+def product_list(request):
+    """
+    Published products, taking the same ``sort``, ``category``, ``q``
+    and ``cursor`` parameters as the catalogue page.
+    """
+    if "q" in request.GET and not request.GET["q"].strip():
+        return JsonResponse(
+            {"error": "Please enter a valid search term."}, status=400
+        )
+
+    listing = filter_products(request.GET)
+    page_data = get_listing_page(listing, request.GET.get("cursor"))
+    page = load_page(page_data, "category")
+    return JsonResponse(
+        {
+            "count": page_data["count"],
+            "next": _absolute_query(request, page.next_cursor),
+            "previous": _absolute_query(request, page.previous_cursor),
+            "results": [
+                _serialise_product(request, product) for product in page
+            ],
+        }
+    )
+
+
+@require_GET
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+def category_list(request):
+    """Every category, parents before their children."""
+    categories = Category.objects.order_by("path").select_related("parent")
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "name": category.name,
+                    "label": category.get_friendly_name() or category.name,
+                    "parent": (
+                        category.parent.name if category.parent else None
+                    ),
+                    "depth": category.depth,
+                }
+                for category in categories
+            ]
+        }
+    )
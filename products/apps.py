@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        # Import signals to register them
+        # pylint: disable=unused-import
+        import products.signals  # noqa
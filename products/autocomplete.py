@@ -0,0 +1,141 @@
+"""
+In-memory prefix index behind the search box suggestions.
+
+Each worker process keeps its own index of published product names and
+category names, built in two queries and answered with binary searches
+over a sorted token list, so a lookup never touches the database. The
+index is rebuilt the first time it is used after the catalog version
+changes (see products.cache).
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+from .cache import get_catalog_version
+from .models import Category, DigitalProduct
+from .search import search_terms
+
+PRODUCT_SUGGESTIONS = 6
+CATEGORY_SUGGESTIONS = 3
+# How often a worker re-reads the catalog version, in seconds
+VERSION_CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "checked_at": 0.0}
+
+
+class PrefixIndex:
+    """
+    Entries searchable by word prefix. ``entries`` must already be in
+    rank order; every query term has to prefix some word of a match.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        keys = sorted(
+            (token, position)
+            for position, entry in enumerate(entries)
+            for token in set(search_terms(entry["label"]))
+        )
+        self._tokens = [token for token, _ in keys]
+        self._positions = [position for _, position in keys]
+        self._labels = [entry["label"].lower() for entry in entries]
+
+    def _prefixed(self, term):
+        start = bisect_left(self._tokens, term)
+        end = bisect_left(self._tokens, term + "\uffff", start)
+        return set(self._positions[start:end])
+
+    def search(self, query, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        matches = None
+        # Longest terms first, as they usually match the fewest words
+        for term in sorted(set(terms), key=len, reverse=True):
+            prefixed = self._prefixed(term)
+            matches = prefixed if matches is None else matches & prefixed
+            if not matches:
+                return []
+
+        # Labels that start with the query itself come first
+        query = query.strip().lower()
+        best = heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda position: (
+                not self._labels[position].startswith(query),
+                position,
+            ),
+        )
+        return [self.entries[position] for position in best]
+
+
+class CatalogIndex:
+    """Product and category indexes for one catalog version."""
+
+    def __init__(self):
+        products = DigitalProduct.objects.filter(
+            status="published"
+        ).order_by("-review_count", "name", "id")
+        self.products = PrefixIndex(
+            [
+                {
+                    "label": name,
+                    "url": reverse("product_detail", args=[product_id]),
+                }
+                for product_id, name in products.values_list("id", "name")
+            ]
+        )
+
+        listing_url = reverse("products")
+        categories = Category.objects.order_by("path")
+        self.categories = PrefixIndex(
+            [
+                {
+                    "label": friendly_name or name,
+                    "url": f"{listing_url}?{urlencode({'category': name})}",
+                }
+                for name, friendly_name in categories.values_list(
+                    "name", "friendly_name"
+                )
+            ]
+        )
+
+    def suggest(self, query):
+        return {
+            "products": self.products.search(query, PRODUCT_SUGGESTIONS),
+            "categories": self.categories.search(
+                query, CATEGORY_SUGGESTIONS
+            ),
+        }
+
+
+def get_catalog_index():
+    """Return this worker's index, rebuilding it for a new catalog."""
+    now = time.monotonic()
+    if (
+        _state["index"] is not None
+        and now - _state["checked_at"] < VERSION_CHECK_INTERVAL
+    ):
+        return _state["index"]
+
+    version = get_catalog_version()
+    _state["checked_at"] = now
+    if _state["index"] is None or _state["version"] != version:
+        with _lock:
+            # Another thread may have rebuilt it while we waited
+            if _state["index"] is None or _state["version"] != version:
+                _state["index"] = CatalogIndex()
+                _state["version"] = version
+    return _state["index"]
+
+
+def suggest(query):
+    """Return the top product and category matches for ``query``."""
+    return get_catalog_index().suggest(query)
@@ -0,0 +1,88 @@
+"""
+Helpers for the bulk catalog commands.
+
+bulk_create, bulk_update and queryset updates skip model signals, so
+callers run ``refresh_after_bulk_write`` on the products they touched to
+bring the search index and the catalog caches back in step. The
+import/export commands share the file formats defined here.
+"""
+
+import csv
+import json
+
+from .cache import bump_catalog_version, bump_product_version
+from .search import get_search_backend
+
+# Columns of an import or export file; ``category`` is a category name
+PRODUCT_FIELDS = [
+    "model_number",
+    "name",
+    "description",
+    "category",
+    "base_price",
+    "image_url",
+    "status",
+]
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(path, requested=None):
+    """Return the requested format, or guess it from the file name."""
+    if requested:
+        return requested
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+class RowError(ValueError):
+    """A row that couldn't be read; the message says why."""
+
+
+def read_rows(stream, file_format):
+    """
+    Yield one dict per product row, reading lazily. A JSON Lines line
+    that isn't a JSON object is yielded as a RowError instead, so the
+    caller can skip it and carry on.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield RowError(f"invalid JSON ({e.msg})")
+            continue
+        if isinstance(row, dict):
+            yield row
+        else:
+            yield RowError("not a JSON object")
+
+
+class RowWriter:
+    """Write product rows to a stream one at a time."""
+
+    def __init__(self, stream, file_format):
+        self.stream = stream
+        self.file_format = file_format
+        if file_format == "csv":
+            self.writer = csv.DictWriter(stream, fieldnames=PRODUCT_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.file_format == "csv":
+            self.writer.writerow(row)
+        else:
+            self.stream.write(json.dumps(row) + "\n")
+
+
+def refresh_after_bulk_write(product_ids):
+    """Reindex and invalidate cached pages for bulk-written products."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    get_search_backend().index_products(product_ids)
+    for product_id in product_ids:
+        bump_product_version(product_id)
+    bump_catalog_version()
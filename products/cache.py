@@ -0,0 +1,204 @@
+"""
+Versioned caching for catalog queries.
+
+Every cache key embeds the current catalog version. Saving or deleting
+a product, category or review bumps the version (see products.signals),
+so stale entries are never read again and simply expire, and nothing
+has to find and delete them. Bumps wait for the surrounding transaction
+to commit, and each catalog bump records when it happened, which the
+API sends as Last-Modified. Product detail pages work the same way
+with a version per product, bumped only by that product and its
+reviews.
+
+Listing hits and misses are counted in process memory and added to the
+shared counters at most every ``STATS_FLUSH_INTERVAL`` seconds, so a
+cached page view never writes to the cache.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .search import search_terms
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_MODIFIED_KEY = "catalog:modified"
+LISTING_CACHE_TIMEOUT = 60 * 15
+LISTING_HITS_KEY = "catalog:listing:hits"
+LISTING_MISSES_KEY = "catalog:listing:misses"
+PRODUCT_VERSION_KEY = "catalog:product:{}:version"
+CATEGORY_VERSION_KEY = "catalog:categories:version"
+STATS_FLUSH_INTERVAL = 30.0
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 60
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never restarts at a
+        # number whose entries might still be cached
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    # Bump once the writer's transaction commits; bumping earlier lets a
+    # concurrent request cache the old rows under the new version
+    transaction.on_commit(lambda: _incr_version(key))
+
+
+def _incr_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _get_version(key)
+
+
+def _stamp_catalog_version():
+    version = _incr_version(CATALOG_VERSION_KEY)
+    cache.set(CATALOG_MODIFIED_KEY, (version, timezone.now()), None)
+
+
+def get_catalog_version():
+    """Return the current catalog version, starting one if needed."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_modified(version):
+    """
+    Return when the catalog changed to ``version``. A version with no
+    recorded time, such as one seeded after eviction, counts as changed
+    now.
+    """
+    stored = cache.get(CATALOG_MODIFIED_KEY)
+    if stored is not None and stored[0] == version:
+        return stored[1]
+    modified = timezone.now()
+    cache.set(CATALOG_MODIFIED_KEY, (version, modified), None)
+    return modified
+
+
+def bump_catalog_version():
+    """Invalidate every versioned catalog entry at once."""
+    transaction.on_commit(_stamp_catalog_version)
+
+
+def get_category_version():
+    """Return the version of the cached category tree."""
+    return _get_version(CATEGORY_VERSION_KEY)
+
+
+def bump_category_version():
+    """Invalidate the cached category tree."""
+    _bump_version(CATEGORY_VERSION_KEY)
+
+
+def get_product_version(product_id):
+    """Return the version of one product's cached detail page."""
+    return _get_version(PRODUCT_VERSION_KEY.format(product_id))
+
+
+def bump_product_version(product_id):
+    """Invalidate the cached detail page of one product."""
+    _bump_version(PRODUCT_VERSION_KEY.format(product_id))
+
+
+def _digest(parts):
+    payload = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def _filter_parts(categories, query):
+    return [
+        sorted(set(filter(None, categories or []))),
+        search_terms(query) if query else [],
+    ]
+
+
+def listing_cache_key(sort, categories, query, cursor):
+    """
+    Build the cache key for one page of the product listing.
+
+    Equivalent requests share a key: category order and duplicates,
+    search case and punctuation, and an empty sort are normalised away.
+    """
+    parts = [sort or "", *_filter_parts(categories, query), cursor or ""]
+    return f"catalog:listing:{get_catalog_version()}:{_digest(parts)}"
+
+
+def facet_cache_key(categories, query):
+    """Build the cache key for the facet counts of a set of filters;
+    sorting and paging don't change them."""
+    parts = _filter_parts(categories, query)
+    return f"catalog:facets:{get_catalog_version()}:{_digest(parts)}"
+
+
+_stats_lock = threading.Lock()
+_stats = {LISTING_HITS_KEY: 0, LISTING_MISSES_KEY: 0, "flushed_at": 0.0}
+
+
+def _add_count(key, count):
+    if not cache.add(key, count, None):
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.add(key, count, None)
+
+
+def flush_listing_cache_stats():
+    """Add this process's unsaved hit and miss counts to the cache."""
+    with _stats_lock:
+        counts = {
+            key: _stats[key] for key in (LISTING_HITS_KEY, LISTING_MISSES_KEY)
+        }
+        _stats.update(dict.fromkeys(counts, 0), flushed_at=time.monotonic())
+    for key, count in counts.items():
+        if count:
+            _add_count(key, count)
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+        due = time.monotonic() - _stats["flushed_at"] >= STATS_FLUSH_INTERVAL
+    if due:
+        flush_listing_cache_stats()
+
+
+def get_cached_listing(key):
+    """Return a cached listing page, recording the hit or miss."""
+    listing = cache.get(key)
+    _count(LISTING_MISSES_KEY if listing is None else LISTING_HITS_KEY)
+    return listing
+
+
+def cache_listing(key, listing):
+    cache.set(key, listing, LISTING_CACHE_TIMEOUT)
+
+
+def listing_cache_stats():
+    """
+    Return hit and miss counts for the listing cache. Other processes'
+    counts show up once they have been flushed.
+    """
+    flush_listing_cache_stats()
+    hits = cache.get(LISTING_HITS_KEY, 0)
+    misses = cache.get(LISTING_MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "catalog_version": get_catalog_version(),
+    }
+
+
+def reset_listing_cache_stats():
+    flush_listing_cache_stats()
+    cache.delete_many([LISTING_HITS_KEY, LISTING_MISSES_KEY])
@@ -1,10 +1,53 @@
 # products/context_processors.py
 
+import time
+
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_category_version
 from .models import Category
 
+CATEGORY_MENU_TIMEOUT = 60 * 60 * 24
+# How often a process re-reads the category version, in seconds
+VERSION_CHECK_INTERVAL = 1.0
+
+# This process's copy of the menu, as (version, categories, checked_at)
+_local_menu = (None, [], 0.0)
+
+
+def get_category_menu():
+    """
+    Return every category in tree order. Each process keeps a copy, with
+    the shared cache behind it, until a category is saved or deleted.
+    The version is re-read at most once a second.
+    """
+    global _local_menu
+    local_version, categories, checked_at = _local_menu
+    now = time.monotonic()
+    if (
+        local_version is not None
+        and now - checked_at < VERSION_CHECK_INTERVAL
+    ):
+        return categories
+
+    version = get_category_version()
+    if local_version == version:
+        _local_menu = (version, categories, now)
+        return categories
+
+    key = f"catalog:categories:{version}:menu"
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by("path"))
+        cache.set(key, categories, CATEGORY_MENU_TIMEOUT)
+    _local_menu = (version, categories, now)
+    return categories
+
 
 def categories_context(request):
-    """Adds all categories to the context for global use (e.g. navbar)."""
+    """Adds all categories to the context for global use (e.g. navbar).
+    Nothing is loaded unless a template actually uses them."""
     return {
-        'categories': Category.objects.all()
+        'categories': SimpleLazyObject(get_category_menu)
     }
@@ -0,0 +1,151 @@
+"""
+Facet counts for the product listing sidebar.
+
+All counts come from a single query grouped by category, with one
+conditional COUNT per price band, license price band and star bucket.
+Each facet is counted with every filter but its own: the query skips
+the category filter, so the category facet counts every category, and
+the other facets sum only the rows of the selected categories.
+"""
+
+from decimal import ROUND_FLOOR, Decimal
+
+from django.db.models import Count, Q
+
+from .models import Category, DigitalProduct, LICENSE_MULTIPLIERS
+
+PRICE_BANDS = [
+    ("Under £5", None, Decimal("5")),
+    ("£5 to £10", Decimal("5"), Decimal("10")),
+    ("£10 to £20", Decimal("10"), Decimal("20")),
+    ("£20 and over", Decimal("20"), None),
+]
+STAR_BUCKETS = [5, 4, 3, 2, 1]
+CENT = Decimal("0.01")
+
+
+def _lowest_base_price(price, multiplier):
+    """
+    The lowest base price whose license price, rounded to pence as the
+    product pages show it, is at least ``price``
+    """
+    base = max(
+        (price / multiplier).quantize(CENT, rounding=ROUND_FLOOR) - CENT,
+        Decimal("0.00"),
+    )
+    while round(base * multiplier, 2) < price:
+        base += CENT
+    return base
+
+
+def _price_band_filter(low, high, multiplier=Decimal("1.00")):
+    """Products whose price for a license multiplier is in [low, high)"""
+    band = Q()
+    if low is not None:
+        band &= Q(base_price__gte=_lowest_base_price(low, multiplier))
+    if high is not None:
+        band &= Q(base_price__lt=_lowest_base_price(high, multiplier))
+    return band
+
+
+def _star_filter(stars):
+    """Products whose rating rounds to ``stars``, as the cards show it"""
+    half = Decimal("0.5")
+    return Q(
+        review_count__gt=0,
+        rating__gte=stars - half,
+        rating__lt=stars + half,
+    )
+
+
+def compute_facets(items, category_subtree=None):
+    """
+    Return facet counts for the products matched by ``items``, which
+    must not be filtered by category yet. ``category_subtree`` is the
+    selected categories with their descendants, or None for all.
+    """
+    counts = {
+        "total": Count("id"),
+        "unrated": Count("id", filter=Q(review_count=0)),
+    }
+    for index, (_, low, high) in enumerate(PRICE_BANDS):
+        counts[f"price_{index}"] = Count(
+            "id", filter=_price_band_filter(low, high)
+        )
+        for license_type, multiplier in LICENSE_MULTIPLIERS.items():
+            counts[f"{license_type}_{index}"] = Count(
+                "id", filter=_price_band_filter(low, high, multiplier)
+            )
+    for stars in STAR_BUCKETS:
+        counts[f"stars_{stars}"] = Count("id", filter=_star_filter(stars))
+
+    # Filter on a pk subquery so annotations such as the search rank
+    # don't leak into the GROUP BY
+
+    rows = list(
+        DigitalProduct.objects.filter(pk__in=items.values("pk"))
+        .order_by()
+        .values("category_id")
+        .annotate(**counts)
+    )
+    by_category = {row["category_id"]: row["total"] for row in rows}
+    if category_subtree is not None:
+        selected = set(category_subtree.values_list("pk", flat=True))
+        rows = [row for row in rows if row["category_id"] in selected]
+    totals = {
+        name: sum(row[name] for row in rows) for name in counts
+    }
+
+    return {
+        "categories": _category_facets(by_category),
+        "price_bands": [
+            {"label": label, "count": totals[f"price_{index}"]}
+            for index, (label, _, _) in enumerate(PRICE_BANDS)
+        ],
+        "license_price_bands": [
+            {
+                "license": license_type,
+                "bands": [
+                    {
+                        "label": label,
+                        "count": totals[f"{license_type}_{index}"],
+                    }
+                    for index, (label, _, _) in enumerate(PRICE_BANDS)
+                ],
+            }
+            for license_type in LICENSE_MULTIPLIERS
+        ],
+        "ratings": [
+            {"stars": stars, "count": totals[f"stars_{stars}"]}
+            for stars in STAR_BUCKETS
+        ],
+        "unrated": totals["unrated"],
+    }
+
+
+def _category_facets(by_category):
+    """Roll direct counts up the tree so parents include subcategories"""
+    categories = Category.objects.order_by("path").only(
+        "id", "name", "friendly_name", "path", "depth"
+    )
+    subtree_counts = {}
+    for category in categories:
+        direct = by_category.get(category.pk, 0)
+        for ancestor_id in category.path.split("/")[:-1]:
+            ancestor_id = int(ancestor_id)
+            subtree_counts[ancestor_id] = (
+                subtree_counts.get(ancestor_id, 0) + direct
+            )
+
+    facets = []
+    for category in categories:
+        count = subtree_counts.get(category.pk, 0)
+        facets.append(
+            {
+                "name": category.name,
+                "label": category.get_friendly_name() or category.name,
+                "depth": category.depth,
+                "count": count,
+            }
+        )
+    return facets
@@ -1,8 +1,11 @@
 from django import forms
+from avagen.images import ImageDerivativesFormMixin
 from .models import DigitalProduct, Category
 
 
-class ProductForm(forms.ModelForm):
+class ProductForm(ImageDerivativesFormMixin, forms.ModelForm):
+    derivative_fields = {"image": "image_derivatives"}
+
     class Meta:
         model = DigitalProduct
         fields = [
@@ -0,0 +1,150 @@
+"""
+The product listing query, shared by the products page, the catalogue
+page and the JSON API so they all filter, sort and paginate the same
+way.
+"""
+
+from django.db.models.functions import Lower
+
+from .cache import cache_listing, get_cached_listing, listing_cache_key
+from .models import Category, DigitalProduct
+from .pagination import InvalidCursor, KeysetPage, KeysetPaginator
+from .search import get_search_backend
+
+PRODUCTS_PER_PAGE = 24
+
+
+def filter_products(params):
+    """
+    Apply the ``sort``, ``category`` and ``q`` parameters of a listing
+    request to the published products.
+
+    Returns a dict with the filtered ``items``, their keyset
+    ``ordering`` and the normalised parameters. ``facet_items`` skips
+    the category filter and ``category_subtree`` holds the categories it
+    allows, so the category facet can offer the other categories too. A
+    blank ``q`` must be rejected by the caller first.
+    """
+    items = DigitalProduct.objects.filter(status="published")
+    active_query = None
+    selected_categories = None
+    category_subtree = None
+    category_names = []
+    sort_option = params.get("sort", "")
+    ordering = ("id",)
+
+    # Handle sorting logic
+
+    if sort_option:
+        match sort_option:
+            case "price_asc":
+                ordering = ("base_price", "id")
+            case "price_desc":
+                ordering = ("-base_price", "-id")
+            case "name_az":
+                items = items.annotate(lower_name=Lower("name"))
+                ordering = ("lower_name", "id")
+            case "name_za":
+                items = items.annotate(lower_name=Lower("name"))
+                ordering = ("-lower_name", "-id")
+            case "rating_high":
+                ordering = ("-rating", "name", "id")
+            case "rating_low":
+                ordering = ("rating", "name", "id")
+            case "newest":
+                ordering = ("-created_at", "-id")
+    # Category filter
+
+    if "category" in params:
+        category_names = params["category"].split(",")
+        selected_categories = list(
+            Category.objects.filter(name__in=category_names)
+        )
+        # Include products filed under any subcategory as well
+        category_subtree = Category.objects.subtree(*selected_categories)
+    # Search query
+
+    if "q" in params:
+        active_query = params["q"]
+        items = get_search_backend().search(items, active_query)
+        if not sort_option:
+            ordering = ("-search_rank", "id")
+
+    facet_items = items
+    if category_subtree is not None:
+        items = items.filter(category__in=category_subtree)
+
+    return {
+        "items": items,
+        "facet_items": facet_items,
+        "category_subtree": category_subtree,
+        "ordering": ordering,
+        "sort": sort_option,
+        "category_names": category_names,
+        "categories": selected_categories,
+        "query": active_query,
+    }
+
+
+def get_listing_page(listing, cursor):
+    """
+    Return the ids, cursors and total count for one page of a filtered
+    listing. Pages are cached per catalog version, so repeat visits
+    skip filtering, ranking and pagination entirely.
+    """
+    cache_key = listing_cache_key(
+        listing["sort"], listing["category_names"], listing["query"], cursor
+    )
+    page = get_cached_listing(cache_key)
+    if page is None:
+        page = _paginate_listing(
+            listing["items"], listing["ordering"], cursor
+        )
+        cache_listing(cache_key, page)
+    return page
+
+
+def load_page(page, *related):
+    """Load a cached page's products, in order, as a KeysetPage."""
+    position = {pk: index for index, pk in enumerate(page["ids"])}
+    products = DigitalProduct.objects.filter(
+        pk__in=page["ids"]
+    ).select_related(*related)
+    products = sorted(products, key=lambda product: position[product.pk])
+    return KeysetPage(
+        products, page["next_cursor"], page["previous_cursor"]
+    )
+
+
+def page_query(request, cursor):
+    """Return the current query string with ``cursor`` swapped in."""
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query["cursor"] = cursor
+    return query.urlencode()
+
+
+def _paginate_listing(items, ordering, cursor):
+    """Run the listing query for one page and return what gets cached."""
+    paginator = KeysetPaginator(
+        items.only("pk", *_ordering_fields(ordering)),
+        ordering,
+        PRODUCTS_PER_PAGE,
+    )
+    try:
+        page = paginator.page(cursor)
+    except InvalidCursor:
+        page = paginator.page()
+    return {
+        "ids": [product.pk for product in page.object_list],
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+        "count": items.count(),
+    }
+
+
+def _ordering_fields(ordering):
+    """Model fields named in ``ordering``, leaving out annotations."""
+    names = {field.name for field in DigitalProduct._meta.concrete_fields}
+    return [key.lstrip("-") for key in ordering if key.lstrip("-") in names]
@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from avagen.images import DERIVATIVE_SOURCES, generate_derivatives
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Build responsive image derivatives for product and profile "
+        "images that don't have them yet, e.g. images uploaded before "
+        "derivatives existed"
+    )
+
+    def handle(self, *args, **options):
+        for label, image_field, derivatives_field in DERIVATIVE_SOURCES:
+            model = apps.get_model(label)
+            pks = (
+                model.objects.exclude(**{image_field: ""})
+                .exclude(**{f"{image_field}__isnull": True})
+                .values_list("pk", flat=True)
+            )
+            count = 0
+            for pk in pks.iterator():
+                # Skips instances whose derivatives are already current
+                generate_derivatives(
+                    label, pk, image_field, derivatives_field
+                )
+                count += 1
+            self.stdout.write(
+                self.style.SUCCESS(f"Checked {count} {label} images")
+            )
@@ -0,0 +1,90 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, PRODUCT_FIELDS, RowWriter, detect_format
+from products.models import DigitalProduct
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Stream the product catalog to a CSV or JSON Lines file in the "
+        "format import_products reads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="-",
+            help="File to write; standard output by default",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format; guessed from the extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of products fetched from the database at a time",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[value for value, _ in DigitalProduct.STATUS_CHOICES],
+            help="Only export products with this status",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = detect_format(path, options["format"])
+        products = (
+            DigitalProduct.objects.select_related("category")
+            .only(*PRODUCT_FIELDS, "category__name")
+            .order_by("pk")
+        )
+        if options["status"]:
+            products = products.filter(status=options["status"])
+
+        if path == "-":
+            stream = sys.stdout
+        else:
+            try:
+                stream = open(path, "w", newline="", encoding="utf-8")
+            except OSError as e:
+                raise CommandError(f"Could not open {path}: {e}")
+
+        count = 0
+        try:
+            writer = RowWriter(stream, file_format)
+            # iterator() streams rows instead of caching the whole
+            # catalog on the queryset
+            for product in products.iterator(
+                chunk_size=options["batch_size"]
+            ):
+                writer.write(
+                    {
+                        "model_number": product.model_number or "",
+                        "name": product.name,
+                        "description": product.description or "",
+                        "category": (
+                            product.category.name if product.category
+                            else ""
+                        ),
+                        "base_price": str(product.base_price),
+                        "image_url": product.image_url or "",
+                        "status": product.status,
+                    }
+                )
+                count += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        if path != "-":
+            self.stdout.write(
+                self.style.SUCCESS(f"Exported {count} products to {path}")
+            )
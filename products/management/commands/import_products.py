@@ -0,0 +1,184 @@
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from products.bulk import (
+    FORMATS,
+    PRODUCT_FIELDS,
+    RowError,
+    detect_format,
+    read_rows,
+    refresh_after_bulk_write,
+)
+from products.models import Category, DigitalProduct
+
+MAX_PRICE = Decimal("9999.99")
+STATUSES = {value for value, _ in DigitalProduct.STATUS_CHOICES}
+UPDATE_FIELDS = [
+    field for field in PRODUCT_FIELDS if field != "model_number"
+] + ["license_price_matrix", "modified_at"]
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Create or update products from a CSV or JSON Lines file, "
+        "matching existing products on model_number"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format; guessed from the extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows read and written per batch",
+        )
+        parser.add_argument(
+            "--create-categories",
+            action="store_true",
+            help="Create categories that don't exist yet instead of "
+            "skipping their rows",
+        )
+
+    def handle(self, *args, **options):
+        file_format = detect_format(options["path"], options["format"])
+        self.create_categories = options["create_categories"]
+        # Categories are few, so map them once rather than per row
+        self.categories = {
+            category.name: category for category in Category.objects.all()
+        }
+        self.created = self.updated = self.skipped = 0
+
+        try:
+            stream = open(options["path"], newline="", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Could not open {options['path']}: {e}")
+        with stream:
+            rows = enumerate(read_rows(stream, file_format), start=1)
+            while True:
+                batch = list(islice(rows, options["batch_size"]))
+                if not batch:
+                    break
+                self._import_batch(batch)
+                self.stdout.write(
+                    f"{self.created} created, {self.updated} updated, "
+                    f"{self.skipped} skipped"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {self.created + self.updated} products "
+                f"({self.created} new, {self.updated} updated, "
+                f"{self.skipped} skipped)"
+            )
+        )
+
+    def _import_batch(self, batch):
+        # Later rows win when a file repeats a model number
+        values = {}
+        unnumbered = []
+        for line, row in batch:
+            cleaned = self._clean(line, row)
+            if cleaned is None:
+                self.skipped += 1
+            elif cleaned["model_number"]:
+                values[cleaned["model_number"]] = cleaned
+            else:
+                unnumbered.append(cleaned)
+
+        existing = {
+            product.model_number: product
+            for product in DigitalProduct.objects.filter(
+                model_number__in=values
+            )
+        }
+        now = timezone.now()
+        to_update = []
+        to_create = [DigitalProduct(**fields) for fields in unnumbered]
+        for model_number, fields in values.items():
+            product = existing.get(model_number)
+            if product is None:
+                to_create.append(DigitalProduct(**fields))
+                continue
+            for name, value in fields.items():
+                setattr(product, name, value)
+            product.modified_at = now
+            to_update.append(product)
+        # Bulk writes skip save(), which would store the license prices
+        for product in to_create + to_update:
+            product.set_license_prices()
+
+        with transaction.atomic():
+            DigitalProduct.objects.bulk_update(to_update, UPDATE_FIELDS)
+            started = timezone.now()
+            created = DigitalProduct.objects.bulk_create(to_create)
+            # Only some backends return ids from bulk_create
+            created_ids = [product.pk for product in created if product.pk]
+            if len(created_ids) < len(created):
+                created_ids = DigitalProduct.objects.filter(
+                    created_at__gte=started
+                ).values_list("pk", flat=True)
+            refresh_after_bulk_write(
+                [product.pk for product in to_update] + list(created_ids)
+            )
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+    def _clean(self, line, row):
+        """Validate one row, returning model field values or None."""
+        if isinstance(row, RowError):
+            return self._skip(line, str(row))
+        # JSON Lines values may be numbers or null; CSV values are text
+        row = {
+            key: "" if value is None else str(value)
+            for key, value in row.items()
+        }
+        name = row.get("name", "").strip()
+        if not name:
+            return self._skip(line, "missing name")
+        try:
+            base_price = Decimal(row.get("base_price", "").strip())
+        except InvalidOperation:
+            return self._skip(line, "invalid base_price")
+        if not base_price.is_finite() or not 0 <= base_price <= MAX_PRICE:
+            return self._skip(line, "invalid base_price")
+
+        status = row.get("status", "").strip() or "published"
+        if status not in STATUSES:
+            return self._skip(line, f"unknown status {status!r}")
+
+        category = None
+        category_name = row.get("category", "").strip()
+        if category_name:
+            category = self.categories.get(category_name)
+            if category is None:
+                if not self.create_categories:
+                    return self._skip(
+                        line, f"unknown category {category_name!r}"
+                    )
+                category = Category.objects.create(name=category_name)
+                self.categories[category_name] = category
+
+        return {
+            "model_number": row.get("model_number", "").strip() or None,
+            "name": name,
+            "description": row.get("description", ""),
+            "category": category,
+            "base_price": base_price.quantize(Decimal("0.01")),
+            "image_url": row.get("image_url", "").strip() or None,
+            "status": status,
+        }
+
+    def _skip(self, line, reason):
+        self.stderr.write(f"Row {line}: {reason}, skipped")
+        return None
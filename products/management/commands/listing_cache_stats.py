@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from products.cache import listing_cache_stats, reset_listing_cache_stats
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = "Show hit and miss counts for the product listing cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them",
+        )
+
+    def handle(self, *args, **options):
+        stats = listing_cache_stats()
+        self.stdout.write(f"Catalog version: {stats['catalog_version']}")
+        self.stdout.write(f"Hits:            {stats['hits']}")
+        self.stdout.write(f"Misses:          {stats['misses']}")
+        self.stdout.write(f"Hit rate:        {stats['hit_rate']:.1%}")
+
+        if options["reset"]:
+            reset_listing_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
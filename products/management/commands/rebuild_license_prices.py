@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.bulk import refresh_after_bulk_write
+from products.models import DigitalProduct
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Recalculate the stored license prices of every product, e.g. "
+        "after LICENSE_TIERS changes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products written per UPDATE batch",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        products = DigitalProduct.objects.only(
+            "pk", "base_price", "license_price_matrix"
+        )
+
+        batch = []
+        updated_ids = []
+        with transaction.atomic():
+            for product in products.iterator(chunk_size=batch_size):
+                old_prices = product.license_price_matrix
+                product.set_license_prices()
+                if product.license_price_matrix == old_prices:
+                    continue
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    DigitalProduct.objects.bulk_update(
+                        batch, ["license_price_matrix"]
+                    )
+                    updated_ids += [product.pk for product in batch]
+                    batch = []
+            if batch:
+                DigitalProduct.objects.bulk_update(
+                    batch, ["license_price_matrix"]
+                )
+                updated_ids += [product.pk for product in batch]
+            refresh_after_bulk_write(updated_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt license prices for {len(updated_ids)} products"
+            )
+        )
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+
+from products.models import DigitalProduct
+from reviews.models import Review
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Recalculate the stored review count, rating and latest review "
+        "of every product from its reviews"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products written per UPDATE batch",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        latest = Review.objects.filter(product=OuterRef("pk")).order_by(
+            "-created_at", "-id"
+        )
+        # One grouped query; products are streamed rather than loaded
+        # into memory all at once
+
+        products = DigitalProduct.objects.annotate(
+            num_reviews=Count("reviews"),
+            total_rating=Sum("reviews__rating"),
+            newest_review=Subquery(latest.values("pk")[:1]),
+        ).only("pk", "review_count", "rating_sum", "rating", "latest_review")
+
+        fields = ["review_count", "rating_sum", "rating", "latest_review"]
+        batch = []
+        updated_count = 0
+        with transaction.atomic():
+            for product in products.iterator(chunk_size=batch_size):
+                product.set_rating_aggregates(
+                    product.num_reviews,
+                    product.total_rating or 0,
+                    product.newest_review,
+                )
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    DigitalProduct.objects.bulk_update(batch, fields)
+                    updated_count += len(batch)
+                    batch = []
+            if batch:
+                DigitalProduct.objects.bulk_update(batch, fields)
+                updated_count += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt rating aggregates for {updated_count} products"
+            )
+        )
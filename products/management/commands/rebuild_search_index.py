@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    # Help text shown when running `python manage.py help <command>`
+
+    help = (
+        "Rebuild the product full-text search index, e.g. after bulk "
+        "updates that bypass model signals"
+    )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt search index using {type(backend).__name__}"
+            )
+        )
@@ -1,5 +1,14 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from products.bulk import refresh_after_bulk_write
 from products.models import DigitalProduct
 
 # Base URL for Cloudinary where images are assumed to be hosted
@@ -14,36 +23,129 @@ class Command(BaseCommand):
 
     help = "Update product image_url fields with Cloudinary URLs"
 
-    def handle(self, *args, **options):
-        self.stdout.write("Starting to update product image URLs...")
-
-        updated_count = 0
-        total_products = DigitalProduct.objects.count()
-
-        # Iterate over all products in the database
-
-        for product in DigitalProduct.objects.all():
-            # Only update if the product has an image but no image_url
-
-            if product.image and not product.image_url:
-                # Extract the filename from the image path
-
-                filename = os.path.basename(str(product.image))
-
-                # Construct the Cloudinary URL
-
-                cloudinary_url = f"{CLOUDINARY_BASE_URL}{filename}"
-
-                # Update the product's image_url field
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default=CLOUDINARY_BASE_URL,
+            help="URL prefix the image file names are appended to",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products read and written per batch",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changes without saving them",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only set URLs that answer a HEAD request successfully",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=16,
+            help="Concurrent requests when verifying URLs",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5.0,
+            help="Seconds to wait for each verification request",
+        )
 
-                product.image_url = cloudinary_url
-                product.save()
+    def handle(self, *args, **options):
+        self.options = options
+        self.started = time.monotonic()
+        self.checked = self.updated = self.unreachable = 0
+
+        # Only products with an uploaded image but no image_url need a
+        # URL, so let the database pick them out
+
+        products = (
+            DigitalProduct.objects.exclude(Q(image="") | Q(image__isnull=True))
+            .filter(Q(image_url="") | Q(image_url__isnull=True))
+            .only("pk", "image", "image_url")
+            .order_by("pk")
+        )
+        total = products.count()
+        self.stdout.write(
+            f"Starting to update image URLs for {total} products"
+            f"{' (dry run)' if options['dry_run'] else ''}..."
+        )
 
-                updated_count += 1
-                self.stdout.write(f"Updated {product.name}: {cloudinary_url}")
+        # Walk the rows in primary key batches rather than one open
+        # cursor, since each batch rewrites rows the query selects
+
+        self.session = requests.Session()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            self.pool = pool
+            last_pk = 0
+            while True:
+                batch = list(
+                    products.filter(pk__gt=last_pk)[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                self._process(batch, total)
+
+        elapsed = time.monotonic() - self.started
+        action = "Would update" if options["dry_run"] else "Updated"
         self.stdout.write(
             self.style.SUCCESS(
-                f"Successfully updated {updated_count} out of "
-                f"{total_products} products"
+                f"{action} {self.updated} of {total} products in "
+                f"{elapsed:.1f}s ({self.checked / max(elapsed, 1e-6):.0f} "
+                f"products/s); {self.unreachable} URLs unreachable"
             )
         )
+
+    def _process(self, batch, total):
+        base_url = self.options["base_url"]
+        urls = [
+            f"{base_url}{os.path.basename(str(product.image))}"
+            for product in batch
+        ]
+        if self.options["verify"]:
+            reachable = list(self.pool.map(self._is_reachable, urls))
+        else:
+            reachable = [True] * len(urls)
+
+        now = timezone.now()
+        changed = []
+        for product, url, ok in zip(batch, urls, reachable):
+            if not ok:
+                self.unreachable += 1
+                self.stderr.write(f"Unreachable: {url}")
+                continue
+            product.image_url = url
+            product.modified_at = now
+            changed.append(product)
+
+        if changed and not self.options["dry_run"]:
+            with transaction.atomic():
+                DigitalProduct.objects.bulk_update(
+                    changed, ["image_url", "modified_at"]
+                )
+                refresh_after_bulk_write(product.pk for product in changed)
+
+        self.checked += len(batch)
+        self.updated += len(changed)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{self.checked}/{total} checked, {self.updated} updated "
+            f"({self.checked / max(elapsed, 1e-6):.0f} products/s)"
+        )
+
+    def _is_reachable(self, url):
+        try:
+            response = self.session.head(
+                url, timeout=self.options["timeout"], allow_redirects=True
+            )
+        except requests.RequestException:
+            return False
+        return response.ok
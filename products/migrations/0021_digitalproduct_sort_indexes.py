@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:56
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_remove_digitalproduct_is_creator_product'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='digitalproduct',
+            index=models.Index(fields=['base_price', 'id'], name='product_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='digitalproduct',
+            index=models.Index(django.db.models.functions.text.Lower('name'), django.db.models.expressions.F('id'), name='product_lower_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:57
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_alter_review_product'),
+        ('products', '0021_digitalproduct_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalproduct',
+            name='latest_review',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reviews.review'),
+        ),
+        migrations.AddField(
+            model_name='digitalproduct',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='digitalproduct',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='digitalproduct',
+            name='rating',
+            field=models.DecimalField(blank=True, decimal_places=2, default=Decimal('0.00'), max_digits=3),
+        ),
+        migrations.AddIndex(
+            model_name='digitalproduct',
+            index=models.Index(fields=['-rating', 'name', 'id'], name='product_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Sum
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    DigitalProduct = apps.get_model("products", "DigitalProduct")
+    Review = apps.get_model("reviews", "Review")
+
+    latest = Review.objects.filter(product=OuterRef("pk")).order_by(
+        "-created_at", "-id"
+    )
+    products = DigitalProduct.objects.annotate(
+        num_reviews=Count("reviews"),
+        total_rating=Sum("reviews__rating"),
+        newest_review=Subquery(latest.values("pk")[:1]),
+    )
+    for product in products:
+        product.review_count = product.num_reviews
+        product.rating_sum = product.total_rating or 0
+        product.latest_review_id = product.newest_review
+        if product.review_count:
+            product.rating = (
+                Decimal(product.rating_sum) / product.review_count
+            ).quantize(Decimal("0.01"))
+        else:
+            product.rating = Decimal("0.00")
+        product.save(
+            update_fields=[
+                "review_count", "rating_sum", "rating", "latest_review"
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0022_digitalproduct_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            populate_rating_aggregates, migrations.RunPython.noop
+        ),
+    ]
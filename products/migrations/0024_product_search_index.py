@@ -0,0 +1,61 @@
+from django.db import migrations
+
+from products.search import (
+    CATEGORY_TABLE,
+    FTS_TABLE,
+    PRODUCT_TABLE,
+    PostgresSearchBackend,
+    SEARCH_CONFIG,
+)
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the vendor-specific full-text index"""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"ALTER TABLE {PRODUCT_TABLE} ADD COLUMN search_vector tsvector"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX product_search_vector_idx ON {PRODUCT_TABLE} "
+            "USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            f"UPDATE {PRODUCT_TABLE} p SET search_vector = "
+            f"{PostgresSearchBackend.document_sql}",
+            {"config": SEARCH_CONFIG},
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "name, description, model_number, category)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} "
+            "(rowid, name, description, model_number, category) "
+            "SELECT p.id, p.name, coalesce(p.description, ''), "
+            "coalesce(p.model_number, ''), coalesce(c.friendly_name, '') "
+            f"FROM {PRODUCT_TABLE} p "
+            f"LEFT JOIN {CATEGORY_TABLE} c ON c.id = p.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"ALTER TABLE {PRODUCT_TABLE} DROP COLUMN search_vector"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0023_populate_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
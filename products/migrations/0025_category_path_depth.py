@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def build_path(category, seen=()):
+        parent = categories.get(category.parent_id)
+        segment = f"{category.pk:06d}/"
+        if parent is None or parent.pk in seen:
+            return segment
+        return build_path(parent, seen + (category.pk,)) + segment
+
+    for category in categories.values():
+        category.path = build_path(category)
+        category.depth = category.path.count("/") - 1
+    Category.objects.bulk_update(categories.values(), ["path", "depth"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(
+            populate_category_paths, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_category_path_depth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalproduct',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
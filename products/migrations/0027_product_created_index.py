@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0026_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='digitalproduct',
+            index=models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:05
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_license_prices(apps, schema_editor):
+    DigitalProduct = apps.get_model("products", "DigitalProduct")
+    products = list(DigitalProduct.objects.only("pk", "base_price"))
+    multipliers = {
+        license_type: Decimal(multiplier)
+        for license_type, multiplier in settings.LICENSE_TIERS.items()
+    }
+    for product in products:
+        product.license_price_matrix = {
+            license_type: str(round(product.base_price * multiplier, 2))
+            for license_type, multiplier in multipliers.items()
+        }
+    DigitalProduct.objects.bulk_update(
+        products, ["license_price_matrix"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0027_product_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalproduct',
+            name='license_price_matrix',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            populate_license_prices, migrations.RunPython.noop
+        ),
+    ]
@@ -1,8 +1,52 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Concat, Lower, Substr
+from django.utils.functional import cached_property
 from decimal import Decimal
 
+# Price multiplier per license tier, cheapest first; configured by
+# settings.LICENSE_TIERS
+LICENSE_MULTIPLIERS = {
+    license_type: Decimal(multiplier)
+    for license_type, multiplier in settings.LICENSE_TIERS.items()
+}
+DEFAULT_LICENSE = next(iter(LICENSE_MULTIPLIERS))
 
-# Define a model representing product categories
+
+def price_matrix(base_price):
+    """Price of every license tier for a base price, rounded to pence"""
+    return {
+        license_type: round(base_price * multiplier, 2)
+        for license_type, multiplier in LICENSE_MULTIPLIERS.items()
+    }
+
+
+class CategoryQuerySet(models.QuerySet):
+
+    def subtree(self, *categories):
+        """The given categories plus all of their descendants"""
+        subtree = models.Q()
+        for category in categories:
+            subtree |= models.Q(path__startswith=category.path)
+        return self.filter(subtree) if categories else self.none()
+
+    def as_tree(self):
+        """
+        Load the categories in one query and return the roots, each
+        with its ``children`` list filled in depth-first order.
+        """
+        roots = []
+        by_id = {}
+        for category in self.order_by("path"):
+            category.children = []
+            by_id[category.pk] = category
+            parent = by_id.get(category.parent_id)
+            if parent is None:
+                roots.append(category)
+            else:
+                parent.children.append(category)
+        return roots
 
 
 # Define a model representing product categories
@@ -11,6 +55,10 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = "Categories"
 
+    # Width of each zero-padded id in a materialised path, so that
+    # ordering by path lists the tree depth-first
+    PATH_STEP = 6
+
     name = models.CharField(max_length=254)
     friendly_name = models.CharField(max_length=254, null=True, blank=True)
     is_creator = models.BooleanField(default=False)
@@ -21,6 +69,14 @@ class Category(models.Model):
         related_name="subcategories",
         on_delete=models.SET_NULL,
     )
+    # Ancestor ids from the root down, e.g. "000001/000004/"; maintained
+    # by products.signals whenever a category is saved
+    path = models.CharField(
+        max_length=255, default="", db_index=True, editable=False
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -28,8 +84,79 @@ class Category(models.Model):
     def get_friendly_name(self):
         return self.friendly_name
 
+    def _parent_path(self):
+        if not self.parent_id:
+            return ""
+        return (
+            Category.objects.filter(pk=self.parent_id)
+            .values_list("path", flat=True)
+            .first()
+        ) or ""
+
+    def is_own_ancestor(self):
+        """True if the chosen parent is this category or one below it"""
+        if not (self.pk and self.parent_id and self.path):
+            return False
+        return self._parent_path().startswith(self.path)
+
+    def clean(self):
+        if self.is_own_ancestor():
+            raise ValidationError(
+                {"parent": "A category can't be nested inside itself."}
+            )
+
+    def save(self, *args, **kwargs):
+        if self.is_own_ancestor():
+            raise ValueError("A category can't be nested inside itself.")
+        super().save(*args, **kwargs)
+
+    def refresh_tree_path(self):
+        """
+        Recompute this category's path from its parent and move any
+        descendants along with it
+        """
+        old_path = self.path
+        new_path = f"{self._parent_path()}{self.pk:0{self.PATH_STEP}d}/"
+        if new_path == old_path:
+            return
+
+        new_depth = new_path.count("/") - 1
+        Category.objects.filter(pk=self.pk).update(
+            path=new_path, depth=new_depth
+        )
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(
+                pk=self.pk
+            ).update(
+                path=Concat(
+                    models.Value(new_path),
+                    Substr("path", len(old_path) + 1),
+                ),
+                depth=models.F("depth") + (new_depth - self.depth),
+            )
+        self.path = new_path
+        self.depth = new_depth
+
 
 class DigitalProduct(models.Model):
+
+    class Meta:
+        # Composite keys back the keyset pagination in the product listing
+        indexes = [
+            models.Index(
+                fields=["base_price", "id"], name="product_price_id_idx"
+            ),
+            models.Index(
+                Lower("name"), "id", name="product_lower_name_id_idx"
+            ),
+            models.Index(
+                fields=["-rating", "name", "id"], name="product_rating_idx"
+            ),
+            models.Index(
+                fields=["-created_at", "-id"], name="product_created_id_idx"
+            ),
+        ]
+
     STATUS_CHOICES = [
         ("draft", "Draft"),
         ("published", "Published"),
@@ -47,9 +174,30 @@ class DigitalProduct(models.Model):
     base_price = models.DecimalField(max_digits=6, decimal_places=2)
     image_url = models.URLField(max_length=1024, null=True, blank=True)
     image = models.ImageField(null=True, blank=True)
+    # Resized copies of ``image``, built by avagen.images
+    image_derivatives = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
     model_number = models.CharField(max_length=50, null=True, blank=True)
+    # Price of each license tier, stored as strings whenever base_price is
+    # saved; rebuild_license_prices refreshes them after LICENSE_TIERS
+    # changes
+    license_price_matrix = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
+    # Review aggregates, kept in step with reviews.Review by its signals
     rating = models.DecimalField(
-        max_digits=3, decimal_places=2, null=True, blank=True
+        max_digits=3, decimal_places=2, default=Decimal("0.00"), blank=True
+    )
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    latest_review = models.ForeignKey(
+        "reviews.Review",
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
     )
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default="published"
@@ -60,20 +208,60 @@ class DigitalProduct(models.Model):
     def __str__(self):
         return self.name
 
-    def get_price_for_license(self, license_type):
-        license_multipliers = {
-            "personal": Decimal("1.00"),
-            "indie": Decimal("1.15"),  # 15% higher
-            "professional": Decimal("1.35"),  # 35% higher
+    def set_rating_aggregates(
+        self, review_count, rating_sum, latest_review_id
+    ):
+        """Store review totals and derive the average rating from them"""
+        self.review_count = max(review_count, 0)
+        self.rating_sum = max(rating_sum, 0)
+        self.latest_review_id = latest_review_id
+        if self.review_count:
+            self.rating = (
+                Decimal(self.rating_sum) / self.review_count
+            ).quantize(Decimal("0.01"))
+        else:
+            self.rating = Decimal("0.00")
+
+    def set_license_prices(self):
+        """Work out and store the license prices for the base price"""
+        self.license_price_matrix = {
+            license_type: str(price)
+            for license_type, price in price_matrix(self.base_price).items()
         }
-        multiplier = license_multipliers.get(
-            license_type.lower(), Decimal("1.00")
-        )
-        return round(self.base_price * multiplier, 2)
+        self.__dict__.pop("license_prices", None)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.set_license_prices()
+        elif "base_price" in update_fields:
+            self.set_license_prices()
+            kwargs["update_fields"] = [
+                *update_fields, "license_price_matrix"
+            ]
+        super().save(*args, **kwargs)
+
+    @cached_property
+    def license_prices(self):
+        """Stored price for every license tier"""
+        if self.license_price_matrix.keys() != LICENSE_MULTIPLIERS.keys():
+            # Saved before the tiers last changed
+            return price_matrix(self.base_price)
+        return {
+            license_type: Decimal(price)
+            for license_type, price in self.license_price_matrix.items()
+        }
+
+    def get_price_for_license(self, license_type):
+        price = self.license_prices.get(license_type.lower())
+        if price is None:
+            # Unknown licenses are charged the base price
+            price = round(self.base_price, 2)
+        return price
 
     @property
     def from_price(self):
-        return self.get_price_for_license("personal")
+        return self.license_prices[DEFAULT_LICENSE]
 
     @property
     def personal_price(self):
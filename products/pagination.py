@@ -0,0 +1,152 @@
+"""
+Keyset (cursor) pagination for product querysets.
+
+Rather than counting rows with OFFSET, each page remembers the sort key
+of its first and last product and the next page filters on "rows after
+this key". Every page therefore costs the same as the first one,
+and rows added or removed between requests never shift a page.
+"""
+
+import base64
+import json
+from decimal import Decimal
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    """Raised when a cursor cannot be decoded or does not match the
+    current ordering."""
+
+
+class KeysetPage:
+    """A single page of results plus the cursors needed to move
+    either way."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering`` using opaque cursors.
+
+    ``ordering`` is a sequence of field or annotation names, optionally
+    prefixed with ``-``. The final entry must be unique; ``id`` is
+    appended automatically when missing so ties are always broken.
+    None of the ordering values may be NULL.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        ordering = list(ordering)
+        if ordering[-1].lstrip("-") not in ("id", "pk"):
+            descending = ordering[-1].startswith("-")
+            ordering.append("-id" if descending else "id")
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.keys = [
+            (field.lstrip("-"), field.startswith("-")) for field in ordering
+        ]
+
+    def page(self, cursor=None):
+        """Return the page that starts (or ends) at ``cursor``."""
+        if not cursor:
+            return self._forward_page(self.queryset, has_previous=False)
+
+        backwards, values = self.decode_cursor(cursor)
+        boundary = self._boundary_filter(values, backwards)
+        if backwards:
+            return self._backward_page(self.queryset.filter(boundary))
+        return self._forward_page(
+            self.queryset.filter(boundary), has_previous=True
+        )
+
+    def _forward_page(self, queryset, has_previous):
+        rows = list(queryset.order_by(*self.ordering)[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        return self._build_page(rows, has_next, has_previous and bool(rows))
+
+    def _backward_page(self, queryset):
+        reversed_ordering = [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+        rows = list(
+            queryset.order_by(*reversed_ordering)[: self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        rows.reverse()
+        return self._build_page(rows, bool(rows), has_previous)
+
+    def _build_page(self, rows, has_next, has_previous):
+        next_cursor = None
+        previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], backwards=False)
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], backwards=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _boundary_filter(self, values, backwards):
+        """
+        Build ``(k1, k2, ...) > (v1, v2, ...)`` as a chain of ORs, since
+        row-value comparison can't mix ascending and descending keys.
+        """
+        boundary = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            after_lookup = "lt" if descending != backwards else "gt"
+            clause = Q(**{f"{name}__{after_lookup}": values[index]})
+            for prior, (prior_name, _) in enumerate(self.keys[:index]):
+                clause &= Q(**{prior_name: values[prior]})
+            boundary |= clause
+        return boundary
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [_serialise(getattr(obj, name)) for name, _ in self.keys]
+        payload = json.dumps(
+            {"b": int(backwards), "v": values}, separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = payload["v"]
+            backwards = bool(payload["b"])
+        except (ValueError, TypeError, KeyError):
+            raise InvalidCursor("Invalid pagination cursor.")
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor("Cursor does not match the current sort.")
+        return backwards, values
+
+
+def _serialise(value):
+    """Turn a sort key into something JSON can carry; the ORM converts
+    the strings back when they are used in a lookup."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
@@ -0,0 +1,45 @@
+"""
+Batch license pricing.
+
+Each product stores its license prices whenever its base price is saved
+(see ``DigitalProduct.license_prices``). ``price_licenses`` prices a whole
+list of lines from those matrices, loading any products given by id in
+a single query, so carts and orders cost one query however many lines
+they have.
+"""
+
+from .models import DigitalProduct
+
+
+def load_products(product_ids):
+    """Return ``{id: product}`` for the given ids in one query."""
+    product_ids = {int(product_id) for product_id in product_ids}
+    if not product_ids:
+        return {}
+    return DigitalProduct.objects.in_bulk(product_ids)
+
+
+def price_licenses(pairs, products=None):
+    """
+    Price a list of ``(product, license_type)`` pairs.
+
+    ``product`` may be a DigitalProduct or its id. Ids are looked up in
+    ``products`` when given, otherwise loaded together. Returns the unit
+    prices in the same order, with None for products that don't exist.
+    """
+    pairs = list(pairs)
+    if products is None:
+        products = load_products(
+            product
+            for product, _ in pairs
+            if not isinstance(product, DigitalProduct)
+        )
+    prices = []
+    for product, license_type in pairs:
+        if not isinstance(product, DigitalProduct):
+            product = products.get(int(product))
+        prices.append(
+            None if product is None
+            else product.get_price_for_license(license_type)
+        )
+    return prices
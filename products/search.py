@@ -0,0 +1,206 @@
+"""
+Full-text search over the product catalog.
+
+Products are indexed on their name, description, model number and
+category friendly name. PostgreSQL keeps a weighted ``tsvector`` column
+with a GIN index on the product table; SQLite keeps an FTS5 table keyed
+by product id. Other databases fall back to ``icontains`` lookups.
+
+Backends annotate matching products with ``search_rank`` (higher is
+more relevant) so the listing can order and paginate on it.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+PRODUCT_TABLE = "products_digitalproduct"
+CATEGORY_TABLE = "products_category"
+FTS_TABLE = "products_digitalproduct_fts"
+SEARCH_CONFIG = "english"
+
+_backend = None
+
+
+def search_terms(query):
+    """Split a raw search string into plain word tokens."""
+    return re.findall(r"\w+", query.lower())
+
+
+class SearchBackend:
+    """Fallback backend: case-insensitive substring matching, unranked."""
+
+    def no_results(self, queryset):
+        return queryset.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return self.no_results(queryset)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term)
+                | Q(description__icontains=term)
+                | Q(model_number__icontains=term)
+                | Q(category__friendly_name__icontains=term)
+            )
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    def index_products(self, product_ids):
+        pass
+
+    def index_category(self, category_id):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Weighted ``tsvector`` column searched through a GIN index."""
+
+    document_sql = (
+        "setweight(to_tsvector(%(config)s, coalesce(p.name, '')), 'A') || "
+        "setweight(to_tsvector(%(config)s, "
+        "coalesce(p.model_number, '')), 'A') || "
+        "setweight(to_tsvector(%(config)s, coalesce(("
+        f"SELECT c.friendly_name FROM {CATEGORY_TABLE} c "
+        "WHERE c.id = p.category_id), '')), 'B') || "
+        "setweight(to_tsvector(%(config)s, "
+        "coalesce(p.description, '')), 'C')"
+    )
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return self.no_results(queryset)
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        vector = f'"{PRODUCT_TABLE}"."search_vector"'
+        return queryset.annotate(
+            search_match=RawSQL(
+                f"{vector} @@ to_tsquery(%s, %s)",
+                (SEARCH_CONFIG, tsquery),
+                output_field=BooleanField(),
+            ),
+            search_rank=RawSQL(
+                f"ts_rank({vector}, to_tsquery(%s, %s))",
+                (SEARCH_CONFIG, tsquery),
+                output_field=FloatField(),
+            ),
+        ).filter(search_match=True)
+
+    def _update(self, where, params):
+        sql = (
+            f"UPDATE {PRODUCT_TABLE} p SET search_vector = "
+            f"{self.document_sql} WHERE {where}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {"config": SEARCH_CONFIG, **params})
+
+    def index_products(self, product_ids):
+        if product_ids:
+            self._update("p.id = ANY(%(ids)s)", {"ids": list(product_ids)})
+
+    def index_category(self, category_id):
+        self._update(
+            "p.category_id = %(category)s", {"category": category_id}
+        )
+
+    def rebuild(self):
+        self._update("TRUE", {})
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 table whose rowid is the product id, ranked with bm25()."""
+
+    # bm25() column weights: name, description, model number, category
+    rank_sql = f"-bm25({FTS_TABLE}, 10.0, 1.0, 10.0, 4.0)"
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return self.no_results(queryset)
+        match = " ".join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                (match,),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT {self.rank_sql} FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f'AND {FTS_TABLE}.rowid = "{PRODUCT_TABLE}"."id"',
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+
+    def _reindex(self, where, params):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                f"(SELECT p.id FROM {PRODUCT_TABLE} p WHERE {where})",
+                params,
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} "
+                "(rowid, name, description, model_number, category) "
+                "SELECT p.id, p.name, coalesce(p.description, ''), "
+                "coalesce(p.model_number, ''), "
+                "coalesce(c.friendly_name, '') "
+                f"FROM {PRODUCT_TABLE} p "
+                f"LEFT JOIN {CATEGORY_TABLE} c ON c.id = p.category_id "
+                f"WHERE {where}",
+                params,
+            )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            self._reindex(f"p.id IN ({placeholders})", product_ids)
+
+    def index_category(self, category_id):
+        self._reindex("p.category_id = %s", [category_id])
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} "
+                    f"WHERE rowid IN ({placeholders})",
+                    product_ids,
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        self._reindex("1 = 1", [])
+
+
+def get_search_backend():
+    """Return the search backend for the default database."""
+    global _backend
+    if _backend is None:
+        if connection.vendor == "postgresql":
+            _backend = PostgresSearchBackend()
+        elif (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        ):
+            _backend = SQLiteSearchBackend()
+        else:
+            _backend = SearchBackend()
+    return _backend
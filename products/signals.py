@@ -0,0 +1,90 @@
+"""
+Keeps derived catalog data in step with product and category changes.
+"""
+
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from reviews.models import Review
+
+from .cache import (
+    bump_catalog_version,
+    bump_category_version,
+    bump_product_version,
+)
+from .models import DigitalProduct, Category
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=DigitalProduct)
+def index_product_on_save(sender, instance, **kwargs):
+    """
+    Refresh the product's full-text search entry
+    """
+    get_search_backend().index_products([instance.pk])
+
+
+@receiver(post_delete, sender=DigitalProduct)
+def index_product_on_delete(sender, instance, **kwargs):
+    """
+    Drop the product's full-text search entry
+    """
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def update_category_path(sender, instance, **kwargs):
+    """
+    Keep the category's materialised path in step with its parent
+    """
+    instance.refresh_tree_path()
+
+
+@receiver(pre_delete, sender=Category)
+def reroot_subcategories(sender, instance, **kwargs):
+    """
+    Subcategories of a deleted category become roots, taking their own
+    subtrees with them
+    """
+    for child in instance.subcategories.all():
+        child.parent = None
+        child.save(update_fields=["parent"])
+
+
+@receiver(post_save, sender=Category)
+def index_category_on_save(sender, instance, **kwargs):
+    """
+    Category names are searchable, so reindex the products filed under it
+    """
+    get_search_backend().index_category(instance.pk)
+
+
+@receiver(post_save, sender=DigitalProduct)
+@receiver(post_delete, sender=DigitalProduct)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Any catalog change invalidates every cached listing
+    """
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=DigitalProduct)
+@receiver(post_delete, sender=DigitalProduct)
+def invalidate_product_detail(sender, instance, **kwargs):
+    bump_product_version(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_reviewed_product_detail(sender, instance, **kwargs):
+    bump_product_version(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_menu(sender, **kwargs):
+    bump_category_version()
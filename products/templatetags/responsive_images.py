@@ -0,0 +1,48 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+register = template.Library()
+
+DEFAULT_SIZES = "(min-width: 768px) 33vw, 100vw"
+
+
+def _srcset(names):
+    return ", ".join(
+        f"{default_storage.url(name)} {width}w"
+        for width, name in sorted(names.items(), key=lambda i: int(i[0]))
+    )
+
+
+@register.simple_tag
+def responsive_image(
+    field_file, derivatives, alt="", css_class="", sizes=DEFAULT_SIZES
+):
+    """
+    Render an uploaded image as a <picture> with WebP and JPEG srcsets
+    and a blurred placeholder, or as a plain <img> until its
+    derivatives have been built.
+    """
+    if not field_file:
+        return ""
+    derivatives = derivatives or {}
+    if derivatives.get("source") != field_file.name:
+        return format_html(
+            '<img alt="{}" class="{}" src="{}" loading="lazy">',
+            alt, css_class, field_file.url,
+        )
+
+    files = derivatives["files"]
+    largest = max(files["jpeg"], key=int)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img alt="{}" class="{}" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="lazy" decoding="async" '
+        'style="background: url({}) center / cover no-repeat;">'
+        "</picture>",
+        _srcset(files["webp"]), sizes,
+        alt, css_class, default_storage.url(files["jpeg"][largest]),
+        _srcset(files["jpeg"]), sizes,
+        derivatives["width"], derivatives["height"],
+        derivatives["placeholder"],
+    )
@@ -1,4 +1,475 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import search
+from .listing import filter_products
 from .models import DigitalProduct, Category
+from .pagination import InvalidCursor, KeysetPaginator
+from .pricing import price_licenses
+from reviews.models import Review
+
+
+def make_product(name, base_price="5.00", **fields):
+    return DigitalProduct.objects.create(
+        name=name, base_price=Decimal(base_price), **fields
+    )
+
+
+def walk_pages(paginator):
+    """Follow next cursors from the first page, then previous cursors
+    back again, returning the ids seen each way."""
+    forward, pages = [], []
+    page = paginator.page()
+    while True:
+        pages.append(page)
+        forward += [product.pk for product in page]
+        if not page.has_next():
+            break
+        page = paginator.page(page.next_cursor)
+
+    backward = [product.pk for product in page]
+    while page.has_previous():
+        page = paginator.page(page.previous_cursor)
+        backward = [product.pk for product in page] + backward
+    return forward, backward, pages
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Few distinct prices, names and ratings, so every sort has ties
+        for index in range(11):
+            make_product(
+                "Same name" if index % 2 else f"Avatar {index % 3}",
+                base_price=f"{5 + index % 3}.00",
+                rating=Decimal(index % 2 * 4),
+            )
+        DigitalProduct.objects.update(created_at=timezone.now())
+
+    def test_every_sort_pages_through_ties_without_gaps_or_repeats(self):
+        sorts = [
+            "", "price_asc", "price_desc", "name_az", "name_za",
+            "rating_high", "rating_low", "newest",
+        ]
+        for sort in sorts:
+            with self.subTest(sort=sort):
+                listing = filter_products({"sort": sort})
+                expected = list(
+                    listing["items"]
+                    .order_by(*listing["ordering"], "id")
+                    .values_list("pk", flat=True)
+                )
+                paginator = KeysetPaginator(
+                    listing["items"], listing["ordering"], per_page=3
+                )
+                forward, backward, pages = walk_pages(paginator)
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+                self.assertEqual(len(pages), 4)
+
+    def test_rows_added_between_requests_do_not_shift_a_page(self):
+        listing = filter_products({"sort": "price_asc"})
+        paginator = KeysetPaginator(
+            listing["items"], listing["ordering"], per_page=3
+        )
+        first = paginator.page()
+        second = [product.pk for product in paginator.page(first.next_cursor)]
+        make_product("Cheapest", base_price="1.00")
+        self.assertEqual(
+            [product.pk for product in paginator.page(first.next_cursor)],
+            second,
+        )
+
+    def test_bad_cursors_are_rejected(self):
+        paginator = KeysetPaginator(
+            DigitalProduct.objects.all(), ["base_price", "id"], per_page=3
+        )
+        other_sort = KeysetPaginator(
+            DigitalProduct.objects.all(), ["id"], per_page=3
+        )
+        cursors = [
+            "not a cursor",
+            "eyJ4IjoxfQ",  # {"x":1}
+            other_sort.encode_cursor(DigitalProduct.objects.first()),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(cursor)
+
+    def test_listing_shows_the_first_page_for_a_bad_cursor(self):
+        response = self.client.get(
+            reverse("products"), {"sort": "price_asc", "cursor": "garbage"}
+        )
+        self.assertEqual(response.status_code, 200)
+        first = self.client.get(reverse("products"), {"sort": "price_asc"})
+        self.assertEqual(
+            [product.pk for product in response.context["products"]],
+            [product.pk for product in first.context["products"]],
+        )
+
+
+class ReviewAggregateTests(TestCase):
+
+    def setUp(self):
+        self.product = make_product("Alpha")
+        self.other = make_product("Beta")
+
+    def review(self, product, rating):
+        return Review.objects.create(
+            product=product, name="Reviewer", rating=rating
+        )
+
+    def assertAggregates(self, product, count, rating_sum, rating, latest):
+        product.refresh_from_db()
+        self.assertEqual(product.review_count, count)
+        self.assertEqual(product.rating_sum, rating_sum)
+        self.assertEqual(product.rating, Decimal(rating))
+        self.assertEqual(product.latest_review, latest)
+
+    def test_create_adds_to_the_aggregates(self):
+        self.review(self.product, 5)
+        newest = self.review(self.product, 2)
+        self.assertAggregates(self.product, 2, 7, "3.50", newest)
+
+    def test_edit_replaces_the_old_rating(self):
+        review = self.review(self.product, 5)
+        review.rating = 1
+        review.save()
+        self.assertAggregates(self.product, 1, 1, "1.00", review)
+
+    def test_delete_removes_the_rating_and_relinks_the_latest(self):
+        older = self.review(self.product, 4)
+        newest = self.review(self.product, 2)
+        newest.delete()
+        self.assertAggregates(self.product, 1, 4, "4.00", older)
+        older.delete()
+        self.assertAggregates(self.product, 0, 0, "0.00", None)
+
+    def test_moving_a_review_updates_both_products(self):
+        older = self.review(self.product, 4)
+        moved = self.review(self.product, 2)
+        moved.product = self.other
+        moved.save()
+        self.assertAggregates(self.product, 1, 4, "4.00", older)
+        self.assertAggregates(self.other, 1, 2, "2.00", moved)
+
+    def test_rebuild_command_matches_the_signals(self):
+        self.review(self.product, 3)
+        newest = self.review(self.product, 4)
+        DigitalProduct.objects.update(review_count=0, rating_sum=0)
+        call_command("rebuild_rating_aggregates", stdout=StringIO())
+        self.assertAggregates(self.product, 2, 7, "3.50", newest)
+        self.assertAggregates(self.other, 0, 0, "0.00", None)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        creatures = Category.objects.create(
+            name="creatures", friendly_name="Mythical Creatures"
+        )
+        # Created first, so ranking rather than id puts the name first
+        self.in_description = make_product(
+            "Knight", description="Rides a dragon into battle"
+        )
+        self.in_name = make_product("Dragon rider", description="A knight")
+        self.in_category = make_product("Griffin", category=creatures)
+        make_product("Robot", description="Made of steel")
+
+    def search_ids(self, query):
+        listing = filter_products({"q": query})
+        return list(
+            listing["items"]
+            .order_by(*listing["ordering"])
+            .values_list("pk", flat=True)
+        )
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(
+            self.search_ids("dragon"),
+            [self.in_name.pk, self.in_description.pk],
+        )
+
+    def test_every_term_must_match_by_prefix(self):
+        self.assertEqual(
+            self.search_ids("drag batt"), [self.in_description.pk]
+        )
+        self.assertEqual(self.search_ids("mythical"), [self.in_category.pk])
+        self.assertEqual(self.search_ids("unicorn"), [])
+
+    def test_index_follows_product_changes(self):
+        self.in_name.name = "Wyvern rider"
+        self.in_name.save()
+        self.assertEqual(self.search_ids("wyvern"), [self.in_name.pk])
+        self.in_description.delete()
+        self.assertEqual(self.search_ids("dragon"), [])
+
+    def test_falls_back_to_substring_matching_without_fts(self):
+        with mock.patch.object(search, "_backend", None), mock.patch.object(
+            search.connection.introspection, "table_names", return_value=[]
+        ):
+            backend = search.get_search_backend()
+            self.assertIs(type(backend), search.SearchBackend)
+            self.assertCountEqual(
+                self.search_ids("dragon"),
+                [self.in_name.pk, self.in_description.pk],
+            )
+            response = self.client.get(reverse("products"), {"q": "griffin"})
+        self.assertEqual(
+            [product.pk for product in response.context["products"]],
+            [self.in_category.pk],
+        )
+
+
+class CategoryTreeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.avatars = Category.objects.create(name="avatars")
+        self.games = Category.objects.create(name="games")
+        self.fantasy = Category.objects.create(
+            name="fantasy", parent=self.avatars
+        )
+        self.dragons = Category.objects.create(
+            name="dragons", parent=self.fantasy
+        )
+        self.product = make_product("Red dragon", category=self.dragons)
+
+    def assertPath(self, category, *ancestors):
+        category.refresh_from_db()
+        expected = "".join(
+            f"{node.pk:06d}/" for node in (*ancestors, category)
+        )
+        self.assertEqual(category.path, expected)
+        self.assertEqual(category.depth, len(ancestors))
+
+    def listed(self, category_name):
+        items = filter_products({"category": category_name})["items"]
+        return list(items.values_list("pk", flat=True))
+
+    def test_paths_follow_the_parents(self):
+        self.assertPath(self.avatars)
+        self.assertPath(self.fantasy, self.avatars)
+        self.assertPath(self.dragons, self.avatars, self.fantasy)
+
+    def test_reparenting_moves_the_whole_subtree(self):
+        self.fantasy.parent = self.games
+        self.fantasy.save()
+        self.assertPath(self.fantasy, self.games)
+        self.assertPath(self.dragons, self.games, self.fantasy)
+        self.assertEqual(self.listed("games"), [self.product.pk])
+        self.assertEqual(self.listed("avatars"), [])
+
+        self.fantasy.parent = None
+        self.fantasy.save()
+        self.assertPath(self.dragons, self.fantasy)
+        self.assertEqual(self.listed("games"), [])
+
+    def test_deleting_a_parent_makes_its_children_roots(self):
+        self.avatars.delete()
+        self.assertPath(self.fantasy)
+        self.assertPath(self.dragons, self.fantasy)
+
+    def test_a_category_cannot_be_nested_inside_itself(self):
+        self.avatars.parent = self.dragons
+        with self.assertRaises(ValueError):
+            self.avatars.save()
+
+    def test_subtree_filter_includes_descendants(self):
+        self.assertEqual(self.listed("avatars"), [self.product.pk])
+        self.assertEqual(self.listed("fantasy"), [self.product.pk])
+        self.assertEqual(self.listed("games"), [])
+
+    def test_whole_tree_loads_in_one_query(self):
+        with self.assertNumQueries(1):
+            roots = Category.objects.as_tree()
+        self.assertEqual(roots, [self.avatars, self.games])
+        self.assertEqual(roots[0].children, [self.fantasy])
+        self.assertEqual(roots[0].children[0].children, [self.dragons])
+
+
+class FacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.avatars = Category.objects.create(name="avatars")
+        self.games = Category.objects.create(name="games")
+        self.fantasy = Category.objects.create(
+            name="fantasy", parent=self.avatars
+        )
+        make_product("Elf", base_price="3.70", category=self.fantasy)
+        make_product("Orc", base_price="12.00", category=self.avatars)
+        make_product("Racer", base_price="3.00", category=self.games)
+
+    def facets(self, **params):
+        response = self.client.get(reverse("products"), params)
+        return response.context["facets"]
+
+    def test_category_facet_ignores_the_category_filter(self):
+        facets = self.facets(category="games")
+        self.assertEqual(
+            {row["name"]: row["count"] for row in facets["categories"]},
+            {"avatars": 2, "fantasy": 1, "games": 1},
+        )
+
+    def test_other_facets_apply_the_category_filter(self):
+        facets = self.facets(category="avatars")
+        self.assertEqual(
+            [band["count"] for band in facets["price_bands"]],
+            [1, 0, 1, 0],
+        )
+
+    def test_license_bands_follow_the_displayed_price(self):
+        # 3.70 at the 1.35 tier is shown as 5.00, so it isn't under 5
+        professional = {
+            tier["license"]: tier["bands"]
+            for tier in self.facets()["license_price_bands"]
+        }["professional"]
+        self.assertEqual(
+            [band["count"] for band in professional], [1, 1, 1, 0]
+        )
+
+
+class LicensePriceTests(TestCase):
+
+    def setUp(self):
+        self.product = make_product("Alpha", base_price="3.70")
+
+    def test_prices_are_stored_when_the_base_price_is_saved(self):
+        self.assertEqual(
+            self.product.license_price_matrix,
+            {"personal": "3.70", "indie": "4.26", "professional": "5.00"},
+        )
+        self.product.base_price = Decimal("10.00")
+        self.product.save(update_fields=["base_price"])
+        self.product.refresh_from_db()
+        self.assertEqual(
+            self.product.license_price_matrix["professional"], "13.50"
+        )
+
+    def test_batch_pricing_reads_the_stored_prices(self):
+        other = make_product("Beta", base_price="2.00")
+        with self.assertNumQueries(1), mock.patch(
+            "products.models.price_matrix"
+        ) as price_matrix:
+            prices = price_licenses(
+                [
+                    (self.product.pk, "indie"),
+                    (str(other.pk), "professional"),
+                    (other.pk, "unknown"),
+                    (0, "personal"),
+                ]
+            )
+        price_matrix.assert_not_called()
+        self.assertEqual(
+            prices,
+            [Decimal("4.26"), Decimal("2.70"), Decimal("2.00"), None],
+        )
+
+    def test_rebuild_command_refreshes_stale_prices(self):
+        DigitalProduct.objects.update(
+            license_price_matrix={"personal": "1.00"}
+        )
+        call_command("rebuild_license_prices", stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(
+            self.product.license_prices["professional"], Decimal("5.00")
+        )
+
+
+class AdminImageUploadTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        storage = override_settings(
+            MEDIA_ROOT=media_root,
+            DEFAULT_FILE_STORAGE=(
+                "django.core.files.storage.FileSystemStorage"
+            ),
+            IMAGE_DERIVATIVES_ASYNC=False,
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+        admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(admin)
+        self.product = make_product("Alpha", model_number="A1")
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new("RGB", (700, 100), "red").save(buffer, "PNG")
+        return SimpleUploadedFile(
+            "pic.png", buffer.getvalue(), content_type="image/png"
+        )
+
+    def test_admin_upload_builds_derivatives(self):
+        url = reverse(
+            "admin:products_digitalproduct_change", args=[self.product.pk]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                url,
+                {
+                    "name": "Alpha",
+                    "description": "",
+                    "category": "",
+                    "base_price": "5.00",
+                    "image": self.upload(),
+                    "image_url": "",
+                    "model_number": "A1",
+                    "status": "published",
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+        self.product.refresh_from_db()
+        self.assertEqual(
+            sorted(self.product.image_derivatives["files"]["webp"]),
+            ["320", "640"],
+        )
+
+
+class CatalogApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.product = make_product("Alpha")
+        self.url = reverse("api_product_list")
+
+    def test_unchanged_catalog_answers_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_moves_the_etag_on(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.status = "draft"
+            self.product.save()
 
-# Create your tests here.
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 0)
@@ -1,10 +1,17 @@
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.list_digital_products, name="products"),
+    path(
+        "autocomplete/",
+        views.product_autocomplete,
+        name="product_autocomplete",
+    ),
+    path("api/products/", api.product_list, name="api_product_list"),
+    path("api/categories/", api.category_list, name="api_category_list"),
     path("<int:product_id>/", views.product_detail, name="product_detail"),
     path("add/", views.add_product, name="add_product"),
     path("edit/<int:product_id>/", views.edit_product, name="edit_product"),
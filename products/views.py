@@ -1,84 +1,90 @@
 from django.shortcuts import render, redirect, reverse, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Avg
-from django.db.models.functions import Lower, Coalesce
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_GET
 
-from .models import DigitalProduct, Category
+from .models import DigitalProduct
 from .forms import ProductForm
+from .autocomplete import suggest
+from .cache import (
+    LISTING_CACHE_TIMEOUT,
+    PRODUCT_DETAIL_CACHE_TIMEOUT,
+    facet_cache_key,
+    get_product_version,
+)
+from .facets import compute_facets
+from .listing import (
+    filter_products,
+    get_listing_page,
+    load_page,
+    page_query,
+)
 from reviews.forms import ReviewForm
+from reviews.pagination import review_page
 
 
 def list_digital_products(request):
     """Display all products, with support for sorting, category filtering,
-    and search."""
-
-    items = DigitalProduct.objects.filter(status="published")
-    active_query = None
-    selected_categories = None
-    sort_option = request.GET.get("sort", "")
-    sorting_identifier = "None_None"
-
-    # Handle sorting logic
-
-    if sort_option:
-        sorting_identifier = sort_option
-
-        match sort_option:
-            case "price_asc":
-                items = items.order_by("base_price")
-            case "price_desc":
-                items = items.order_by("-base_price")
-            case "name_az":
-                items = items.annotate(lower_name=Lower("name")).order_by(
-                    "lower_name"
-                )
-            case "name_za":
-                items = items.annotate(lower_name=Lower("name")).order_by(
-                    "-lower_name"
-                )
-            case "rating_high":
-                items = items.annotate(
-                    avg_score=Coalesce(Avg("reviews__rating"), 0.0)
-                ).order_by("-avg_score", "name")
-            case "rating_low":
-                items = items.annotate(
-                    avg_score=Coalesce(Avg("reviews__rating"), 0.0)
-                ).order_by("avg_score", "name")
-    # Category filter
-
-    if "category" in request.GET:
-        category_names = request.GET["category"].split(",")
-        items = items.filter(category__name__in=category_names)
-        selected_categories = Category.objects.filter(name__in=category_names)
-    # Search query
-
-    if "q" in request.GET:
-        active_query = request.GET["q"]
-        if not active_query.strip():
-            messages.error(request, "Please enter a valid search term.")
-            return redirect(reverse("products"))
-        lookup = Q(name__icontains=active_query) | Q(
-            description__icontains=active_query
+    search and cursor pagination."""
+
+    if "q" in request.GET and not request.GET["q"].strip():
+        messages.error(request, "Please enter a valid search term.")
+        return redirect(reverse("products"))
+
+    listing = filter_products(request.GET)
+    page_data = get_listing_page(listing, request.GET.get("cursor"))
+
+    # Facet counts depend only on the filters, so every page and sort
+    # order shares them
+
+    facet_key = facet_cache_key(listing["category_names"], listing["query"])
+    facets = cache.get(facet_key)
+    if facets is None:
+        facets = compute_facets(
+            listing["facet_items"], listing["category_subtree"]
         )
-        items = items.filter(lookup)
-    # Calculate average ratings and latest reviews for each product
+        cache.set(facet_key, facets, LISTING_CACHE_TIMEOUT)
 
-    items = items.prefetch_related("reviews")
+    # The cards only show the newest review, so join that one row per
+    # product rather than prefetching every review
+
+    page = load_page(page_data, "category", "latest_review")
 
     context = {
-        "products": items,
-        "search_term": active_query,
-        "current_categories": selected_categories,
-        "current_sorting": sorting_identifier,
+        "products": page.object_list,
+        "page": page,
+        "facets": facets,
+        "product_count": page_data["count"],
+        "next_page_query": page_query(request, page.next_cursor),
+        "previous_page_query": page_query(request, page.previous_cursor),
+        "search_term": listing["query"],
+        "current_categories": listing["categories"],
+        "current_category_names": listing["category_names"],
+        "current_sorting": listing["sort"] or "None_None",
     }
 
     return render(request, "products/products.html", context)
 
 
+@require_GET
+def product_autocomplete(request):
+    """Return product and category suggestions for the search box,
+    served from the in-memory prefix index."""
+    query = request.GET.get("q", "")[:100]
+    return JsonResponse({"query": query, **suggest(query)})
+
+
 def product_detail(request, product_id):
-    product = get_object_or_404(DigitalProduct, pk=product_id)
-    reviews = product.reviews.all().order_by("-created_at")
+    product = get_object_or_404(
+        DigitalProduct.objects.select_related("category"), pk=product_id
+    )
+    # Only the first page of reviews is rendered here, and only when the
+    # cached reviews fragment has to be rebuilt; later pages come from
+    # the product_reviews endpoint
+    reviews = SimpleLazyObject(lambda: review_page(product))
 
     if request.method == "POST":
         review_form = ReviewForm(request.POST)
@@ -90,13 +96,15 @@ def product_detail(request, product_id):
             return redirect(reverse("product_detail", args=[product_id]))
     else:
         review_form = ReviewForm()
-    avg_rating = reviews.aggregate(Avg("rating"))["rating__avg"]
+    avg_rating = product.rating if product.review_count else None
 
     context = {
         "product": product,
         "reviews": reviews,
         "review_form": review_form,
         "avg_rating": avg_rating,
+        "product_version": get_product_version(product.pk),
+        "detail_cache_timeout": PRODUCT_DETAIL_CACHE_TIMEOUT,
     }
 
     return render(request, "products/product_detail.html", context)
@@ -6,6 +6,7 @@ from django.core.validators import FileExtensionValidator
 
 # Import the custom user profile model
 
+from avagen.images import ImageDerivativesFormMixin
 from .models import UserProfile
 
 # Get the currently active User model (custom or default)
@@ -20,7 +21,10 @@ ALLOWED_EXTENSIONS = ["jpg", "jpeg", "png", "gif", "webp"]
 # Form for editing a user's profile (not the core auth user)
 
 
-class UserProfileForm(forms.ModelForm):
+class UserProfileForm(ImageDerivativesFormMixin, forms.ModelForm):
+    # Resized copies of new uploads are built after saving
+    derivative_fields = {"profile_image": "image_derivatives"}
+
     profile_image = forms.ImageField(
         required=False,
         validators=[
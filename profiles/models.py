@@ -19,6 +19,10 @@ class UserProfile(models.Model):
             "Upload a profile picture (JPG, PNG, GIF, WebP up to 5MB)"
         ),
     )
+    # Resized copies of ``profile_image``, built by avagen.images
+    image_derivatives = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
 
     address_line_1 = models.CharField(
         "Address Line 1", max_length=255, blank=True
@@ -31,6 +31,7 @@ def profile(request):
                 if not request.FILES.get("profile_image"):
                     profile_instance.profile_image = profile.profile_image
                 profile_instance.save()
+                profile_form.schedule_image_derivatives()
                 profile.refresh_from_db()
                 messages.success(request, "Profile updated successfully!")
             except Exception as e:
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_alter_review_product'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+        ),
+    ]
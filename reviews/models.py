@@ -3,6 +3,16 @@ from products.models import DigitalProduct
 
 
 class Review(models.Model):
+
+    class Meta:
+        # Backs the newest-first, cursor-paginated review list
+        indexes = [
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="review_product_created_idx",
+            ),
+        ]
+
     product = models.ForeignKey(
         DigitalProduct,
         on_delete=models.CASCADE,
@@ -0,0 +1,18 @@
+"""
+Cursor pagination for a product's reviews, newest first.
+"""
+
+from products.pagination import KeysetPaginator
+
+REVIEWS_PER_PAGE = 10
+
+
+def review_page(product, cursor=None):
+    """
+    Return one page of ``product``'s reviews. Raises InvalidCursor for
+    a cursor that can't be decoded.
+    """
+    paginator = KeysetPaginator(
+        product.reviews.all(), ("-created_at", "-id"), REVIEWS_PER_PAGE
+    )
+    return paginator.page(cursor)
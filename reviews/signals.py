@@ -0,0 +1,137 @@
+"""
+Keeps the review aggregates stored on DigitalProduct (count, rating sum,
+average and latest review) in step as reviews are created, edited and
+deleted.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from products.models import DigitalProduct
+from .models import Review
+
+# Products in the middle of a cascade delete; their reviews are going
+# with them, so there is nothing to keep up to date.
+_deleting = threading.local()
+
+RATING_FIELDS = ["review_count", "rating_sum", "rating", "latest_review"]
+
+
+def _products_being_deleted():
+    if not hasattr(_deleting, "ids"):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def _apply_review_change(
+    product_id, count_delta, sum_delta, latest=None, dropped_id=None,
+    relink_latest=False,
+):
+    """
+    Apply a review delta to a product's stored aggregates.
+
+    ``latest`` is a review known to be the product's newest one. When the
+    current latest review is ``dropped_id``, or ``relink_latest`` is set,
+    the newest remaining review is looked up instead. The product row is
+    locked for the update so concurrent reviews of the same product
+    can't lose each other's counts.
+    """
+    if product_id in _products_being_deleted():
+        return
+    with transaction.atomic():
+        product = (
+            DigitalProduct.objects.select_for_update()
+            .filter(pk=product_id)
+            .only(*RATING_FIELDS)
+            .first()
+        )
+        if product is None:
+            return
+        latest_id = product.latest_review_id
+        if latest is not None:
+            latest_id = latest.pk
+        elif relink_latest or (
+            # Deleting a review nulls out any latest_review pointing at it
+            # before post_delete runs, so None means it may have been ours
+            dropped_id is not None and latest_id in (None, dropped_id)
+        ):
+            latest_id = (
+                Review.objects.filter(product_id=product_id)
+                .exclude(pk=dropped_id)
+                .order_by("-created_at", "-id")
+                .values_list("pk", flat=True)
+                .first()
+            )
+        product.set_rating_aggregates(
+            product.review_count + count_delta,
+            product.rating_sum + sum_delta,
+            latest_id,
+        )
+        product.save(update_fields=RATING_FIELDS)
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    """
+    Record what an edited review looked like before the save
+    """
+    instance._saved_state = None
+    if instance.pk:
+        instance._saved_state = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list("product_id", "rating")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_on_save(sender, instance, created, **kwargs):
+    """
+    Update product aggregates on review create/edit
+    """
+    previous = getattr(instance, "_saved_state", None)
+    if created or previous is None:
+        _apply_review_change(
+            instance.product_id, 1, instance.rating, latest=instance
+        )
+        return
+
+    old_product_id, old_rating = previous
+    if old_product_id == instance.product_id:
+        if old_rating != instance.rating:
+            _apply_review_change(
+                instance.product_id, 0, instance.rating - old_rating
+            )
+        return
+
+    # The review was moved to a different product
+    _apply_review_change(
+        old_product_id, -1, -old_rating, dropped_id=instance.pk
+    )
+    _apply_review_change(
+        instance.product_id, 1, instance.rating, relink_latest=True
+    )
+
+
+@receiver(post_delete, sender=Review)
+def update_on_delete(sender, instance, **kwargs):
+    """
+    Update product aggregates on review delete
+    """
+    _apply_review_change(
+        instance.product_id, -1, -instance.rating, dropped_id=instance.pk
+    )
+
+
+@receiver(pre_delete, sender=DigitalProduct)
+def product_delete_started(sender, instance, **kwargs):
+    _products_being_deleted().add(instance.pk)
+
+
+@receiver(post_delete, sender=DigitalProduct)
+def product_delete_finished(sender, instance, **kwargs):
+    _products_being_deleted().discard(instance.pk)
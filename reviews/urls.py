@@ -3,4 +3,9 @@ from . import views
 
 urlpatterns = [
     path('add/<int:product_id>/', views.add_review, name='add_review'),
+    path(
+        'product/<int:product_id>/',
+        views.product_reviews,
+        name='product_reviews',
+    ),
 ]
@@ -1,8 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 from .forms import ReviewForm
+from .pagination import review_page
 from products.models import DigitalProduct
+from products.pagination import InvalidCursor
 
 
 @login_required
@@ -33,3 +39,26 @@ def add_review(request, product_id):
     }
 
     return render(request, template, context)
+
+
+@require_GET
+def product_reviews(request, product_id):
+    """ Return the next page of a product's reviews as an HTML fragment """
+    product = get_object_or_404(
+        DigitalProduct.objects.only('pk'), pk=product_id
+    )
+    try:
+        page = review_page(product, request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    next_url = None
+    if page.has_next():
+        next_url = (
+            f"{reverse('product_reviews', args=[product.id])}"
+            f"?cursor={page.next_cursor}"
+        )
+    html = render_to_string(
+        'reviews/includes/review_list.html', {'reviews': page}
+    )
+    return JsonResponse({'html': html, 'next': next_url})
@@ -1,4 +1,4 @@
-/* jshint esversion: 6 */
+/* jshint esversion: 8 */
 /* global $ */
 
 $('.btt-link').click(function(e) { window.scrollTo(0, 0); });
@@ -13,6 +13,106 @@ function findQtyInput(k){ return byId(`id_qty_${k.cartKey}`) || byId(`id_qty_${k
 function findUpdateForm(k){ return byId(`update-form-${k.cartKey}`) || byId(`update-form-${k.itemId}`); }
 function findRemoveForm(k){ return byId(`remove-form-${k.cartKey}`) || byId(`remove-form-${k.itemId}`); }
 
+// Cart edits go to the JSON cart endpoints and patch the page in place.
+// Quantity changes made in quick succession are sent as one batch. If a
+// request fails, the line's form is submitted as a normal page load.
+const BATCH_DELAY = 300;
+const pending = new Map();
+let batchTimer = null;
+
+function csrfToken() {
+  const input = document.querySelector('#cart-table [name=csrfmiddlewaretoken]');
+  return input ? input.value : '';
+}
+
+function applyCartResponse(data) {
+  data.lines.forEach(line => {
+    const row = byId(`cart-line-${line.cart_key}`);
+    if (!row) return;
+    if (line.quantity === 0) {
+      row.remove();
+      return;
+    }
+    const input = findQtyInput({ cartKey: line.cart_key, itemId: line.item_id });
+    if (input) input.value = line.quantity;
+    const total = row.querySelector('.line-total');
+    if (total) total.textContent = line.item_total;
+  });
+  if (data.item_count === 0) {
+    // Show the empty cart page rather than an empty table
+    window.location.reload();
+    return;
+  }
+  const grandTotal = byId('cart-grand-total');
+  if (grandTotal) grandTotal.textContent = data.grand_total;
+  document.querySelectorAll('[data-cart-link]').forEach(link => {
+    link.classList.add('text-info', 'font-weight-bold');
+    link.classList.remove('text-black');
+    link.setAttribute('aria-label', `Shopping cart - ${data.grand_total} items`);
+  });
+}
+
+async function postCart(url, body, headers) {
+  const response = await fetch(url, {
+    method: 'POST',
+    body: body,
+    credentials: 'same-origin',
+    headers: Object.assign({ 'X-CSRFToken': csrfToken() }, headers),
+  });
+  if (!response.ok) throw new Error(response.statusText);
+  return response.json();
+}
+
+async function flushChanges() {
+  batchTimer = null;
+  const table = byId('cart-table');
+  const changes = Array.from(pending.values());
+  pending.clear();
+  if (!table || !changes.length) return;
+  try {
+    const data = await postCart(
+      table.dataset.batchUrl,
+      JSON.stringify({ changes: changes.map(change => change.data) }),
+      { 'Content-Type': 'application/json' }
+    );
+    applyCartResponse(data);
+  } catch (error) {
+    const form = findUpdateForm(changes[0].keys);
+    if (form) form.submit();
+  }
+}
+
+function queueQuantity(k) {
+  const input = findQtyInput(k);
+  const form = findUpdateForm(k);
+  if (!input || !form) return;
+  const quantity = parseInt(input.value, 10);
+  if (isNaN(quantity)) return;
+  pending.set(k.cartKey || k.itemId, {
+    keys: k,
+    data: {
+      item_id: k.itemId,
+      action: 'set',
+      license: form.querySelector('[name=license]').value,
+      quantity: quantity,
+    },
+  });
+  clearTimeout(batchTimer);
+  batchTimer = setTimeout(flushChanges, BATCH_DELAY);
+}
+
+async function removeLine(link) {
+  const k = getKeys(link);
+  const form = findRemoveForm(k);
+  if (!form) return;
+  pending.delete(k.cartKey || k.itemId);
+  try {
+    applyCartResponse(await postCart(link.dataset.apiUrl, new FormData(form)));
+  } catch (error) {
+    form.submit();
+  }
+}
+
 document.addEventListener('DOMContentLoaded', () => {
   document.querySelectorAll('.increment-qty, .decrement-qty').forEach(btn => {
     btn.addEventListener('click', (e) => {
@@ -26,31 +126,34 @@ document.addEventListener('DOMContentLoaded', () => {
       if (isNaN(val)) val = min;
       val = btn.classList.contains('increment-qty') ? Math.min(max, val + 1) : Math.max(min, val - 1);
       input.value = val;
-      const form = findUpdateForm(k);
-      if (form) form.submit();
+      queueQuantity(k);
     });
   });
 
   document.querySelectorAll('.qty_input').forEach(input => {
     input.addEventListener('change', () => {
       const form = input.closest('form');
-      if (form) form.submit();
+      const button = form && form.querySelector('.increment-qty');
+      if (button) queueQuantity(getKeys(button));
     });
   });
 
   document.querySelectorAll('.update-link').forEach(link => {
     link.addEventListener('click', (e) => {
       e.preventDefault();
-      const form = findUpdateForm(getKeys(link));
-      if (form) form.submit();
+      queueQuantity(getKeys(link));
     });
   });
 
   document.querySelectorAll('.remove-item').forEach(link => {
     link.addEventListener('click', (e) => {
       e.preventDefault();
-      const form = findRemoveForm(getKeys(link));
-      if (form) form.submit();
+      removeLine(link);
     });
   });
+
+  // Send any queued change before the page goes away
+  window.addEventListener('pagehide', () => {
+    if (batchTimer) flushChanges();
+  });
 });
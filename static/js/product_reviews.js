@@ -0,0 +1,31 @@
+/* jshint esversion: 8 */
+
+// Load further pages of reviews on the product detail page
+document.addEventListener('DOMContentLoaded', function () {
+    const button = document.getElementById('load-more-reviews');
+    const list = document.getElementById('review-list');
+
+    if (!button || !list) {
+        return;
+    }
+
+    button.addEventListener('click', async function () {
+        button.disabled = true;
+        try {
+            const response = await fetch(button.dataset.url);
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            const data = await response.json();
+            list.insertAdjacentHTML('beforeend', data.html);
+            if (data.next) {
+                button.dataset.url = data.next;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        } catch (error) {
+            button.disabled = false;
+        }
+    });
+});
@@ -10,6 +10,9 @@ window.addEventListener('DOMContentLoaded', function () {
             const selection = sortControl.value;
             const currentURL = new URL(window.location);
 
+            // A cursor belongs to the old sort order, so start from page one
+            currentURL.searchParams.delete('cursor');
+
             if (!selection) {
                 currentURL.searchParams.delete('sort');
             } else {
@@ -0,0 +1,70 @@
+/* jshint esversion: 8 */
+
+// Suggest products and categories under the search boxes as the user types
+window.addEventListener('DOMContentLoaded', function () {
+    const inputs = document.querySelectorAll('input[data-autocomplete-url]');
+
+    inputs.forEach(function (input) {
+        const menu = document.createElement('div');
+        menu.className = 'dropdown-menu w-100';
+        menu.setAttribute('role', 'listbox');
+        input.parentElement.classList.add('position-relative');
+        input.parentElement.appendChild(menu);
+
+        let timer = null;
+        let latest = 0;
+
+        function addSection(title, entries) {
+            if (!entries.length) {
+                return;
+            }
+            const header = document.createElement('h6');
+            header.className = 'dropdown-header';
+            header.textContent = title;
+            menu.appendChild(header);
+            entries.forEach(function (entry) {
+                const link = document.createElement('a');
+                link.className = 'dropdown-item text-truncate';
+                link.href = entry.url;
+                link.textContent = entry.label;
+                menu.appendChild(link);
+            });
+        }
+
+        async function update() {
+            const query = input.value.trim();
+            const request = ++latest;
+            if (!query) {
+                menu.classList.remove('show');
+                return;
+            }
+            const url = new URL(input.dataset.autocompleteUrl, window.location);
+            url.searchParams.set('q', query);
+            try {
+                const response = await fetch(url);
+                const data = await response.json();
+                // Ignore answers to queries the user has typed past
+                if (request !== latest) {
+                    return;
+                }
+                menu.innerHTML = '';
+                addSection('Products', data.products);
+                addSection('Categories', data.categories);
+                menu.classList.toggle('show', menu.children.length > 0);
+            } catch (error) {
+                menu.classList.remove('show');
+            }
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(update, 100);
+        });
+        input.addEventListener('blur', function () {
+            // Give clicks on a suggestion time to land
+            setTimeout(function () {
+                menu.classList.remove('show');
+            }, 150);
+        });
+    });
+});